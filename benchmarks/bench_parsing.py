@@ -0,0 +1,45 @@
+"""Compare parsers on realistic Cluster manifests.
+
+Usage: python benchmarks/bench_parsing.py [--clusters N] [--pools N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fleet import make_cluster
+from nkp_inventory.kube import load_yaml
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--pools", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    clusters = [make_cluster(f"cluster-{i}", f"workspace-{i % 5}", args.pools) for i in range(args.clusters)]
+    as_yaml = [yaml.safe_dump(cluster) for cluster in clusters]
+    as_json = [json.dumps(cluster) for cluster in clusters]
+
+    candidates = [
+        ("yaml.safe_load (pure Python)", lambda: [yaml.load(doc, Loader=yaml.SafeLoader) for doc in as_yaml]),
+        ("load_yaml (CSafeLoader if available)", lambda: [load_yaml(doc) for doc in as_yaml]),
+        ("json.loads", lambda: [json.loads(doc) for doc in as_json]),
+    ]
+
+    print(f"{args.clusters} clusters x {args.pools} worker pools, "
+          f"{sum(map(len, as_yaml)) // 1024} KiB YAML / {sum(map(len, as_json)) // 1024} KiB JSON")
+    baseline = None
+    for name, func in candidates:
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        baseline = baseline or best
+        print(f"{name:<40} {best * 1000 / args.clusters:8.3f} ms/cluster  {baseline / best:6.1f}x")
+
+if __name__ == "__main__":
+    main()
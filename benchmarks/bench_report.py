@@ -0,0 +1,206 @@
+"""End-to-end scaling benchmark of the report path on synthetic NKP fleets.
+
+For every fleet size a synthetic fleet is generated and served either by the
+fake kubectl in benchmarks/bin (put first on PATH) or by the stub API server.
+A fresh worker process then times each stage of the report path:
+
+* collection           collect_inventory
+* generate_html_table  extraction and rendering of every cluster
+* save_html_output     writing the report file
+* end-to-end           nkp-as-built.py run as a separate process
+
+and records wall time, kubectl processes started and peak RSS.
+
+Usage:
+    python benchmarks/bench_report.py --sizes 10,500,5000 [--backend kubectl|api]
+        [--json results.json] [--compare baseline.json --tolerance 0.25 --min-delta 0.05]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.fleet import make_fleet, write_fleet
+from benchmarks.stub_apiserver import StubApiServer
+
+def count_calls(calls_file: str) -> int:
+    try:
+        with open(calls_file) as file:
+            return sum(1 for _ in file)
+    except FileNotFoundError:
+        return 0
+
+def peak_rss_mb() -> float:
+    """Peak RSS of this process.
+
+    On Linux ru_maxrss survives fork and exec, so a worker started by the
+    (large) harness would report the harness' peak; VmHWM starts afresh with
+    every exec.
+    """
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is reported in KiB on Linux and in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def run_worker(backend_name: str, chunk_size: int, output: str) -> list:
+    """Time the in-process stages; runs in its own process so peak RSS is per fleet."""
+    from nkp_inventory.collect import collect_inventory
+    from nkp_inventory.kube import get_backend
+    from nkp_inventory.report import generate_report_sections, save_html_output
+
+    calls_file = os.environ["NKP_BENCH_CALLS"]
+    results = []
+
+    def stage(name, func):
+        calls = count_calls(calls_file)
+        start = time.perf_counter()
+        value = func()
+        results.append({
+            "stage": name,
+            "wall": time.perf_counter() - start,
+            "subprocesses": count_calls(calls_file) - calls,
+            "peak_rss_mb": peak_rss_mb(),
+        })
+        return value
+
+    backend = get_backend(backend_name, chunk_size=chunk_size)
+    inventory = stage("collection", lambda: collect_inventory(backend))
+    sections = stage("generate_html_table", lambda: list(generate_report_sections(inventory)))
+    stage("save_html_output", lambda: save_html_output(sections, output))
+    return results
+
+def run_script(script_args: list) -> dict:
+    """Run nkp-as-built.py in this process, as ``python nkp-as-built.py`` would."""
+    script = os.path.join(REPO_DIR, "nkp-as-built.py")
+    sys.argv = [script, *script_args]
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        runpy.run_path(script, run_name="__main__")
+    return {"peak_rss_mb": peak_rss_mb()}
+
+def run_end_to_end(env: dict, backend_name: str, chunk_size: int, workdir: str) -> dict:
+    calls = count_calls(env["NKP_BENCH_CALLS"])
+    start = time.perf_counter()
+    script = subprocess.run(
+        [sys.executable, __file__, "--script", "--", "--backend", backend_name, "--no-cache",
+         "--chunk-size", str(chunk_size)],
+        cwd=workdir, env=env, capture_output=True, text=True)
+    result = {
+        "stage": "end-to-end",
+        "wall": time.perf_counter() - start,
+        "subprocesses": count_calls(env["NKP_BENCH_CALLS"]) - calls,
+        "peak_rss_mb": 0.0,
+        "exit_status": script.returncode,
+    }
+    if script.returncode == 0:
+        result.update(json.loads(script.stdout.strip().splitlines()[-1]))
+    return result
+
+def bench_size(clusters: int, args) -> list:
+    with tempfile.TemporaryDirectory(prefix="nkp-bench-") as workdir:
+        fleet = make_fleet(clusters, args.min_pools, args.max_pools, args.max_machines)
+        machines = len(fleet["machines"])
+        write_fleet(fleet, workdir)
+        del fleet
+
+        env = dict(os.environ,
+                   NKP_BENCH_FLEET=workdir,
+                   NKP_BENCH_CALLS=os.path.join(workdir, "kubectl-calls.log"),
+                   PATH=os.pathsep.join([os.path.join(BENCH_DIR, "bin"), os.environ.get("PATH", "")]))
+        server = None
+        if args.backend == "api":
+            server = StubApiServer(workdir).start()
+            env["KUBECONFIG"] = os.path.join(workdir, "stub.conf")
+            server.write_kubeconfig(env["KUBECONFIG"])
+
+        try:
+            worker = subprocess.run(
+                [sys.executable, __file__, "--worker", "--backend", args.backend, "--chunk-size", str(args.chunk_size),
+                 "--output", os.path.join(workdir, "cluster_details.html")],
+                env=env, capture_output=True, text=True, check=True)
+            results = json.loads(worker.stdout.strip().splitlines()[-1])
+            results.append(run_end_to_end(env, args.backend, args.chunk_size, workdir))
+        finally:
+            if server:
+                server.shutdown()
+
+        for result in results:
+            result.update(clusters=clusters, machines=machines)
+        return results
+
+def compare(results: list, baseline_file: str, tolerance: float, min_delta: float = 0.05) -> list:
+    """Stages slower than in the baseline by more than ``tolerance`` and by more than ``min_delta`` seconds.
+
+    The absolute floor keeps the jitter of stages that take milliseconds from being reported.
+    """
+    with open(baseline_file) as file:
+        baseline = {(r["clusters"], r["stage"]): r for r in json.load(file)}
+    regressions = []
+    for result in results:
+        before = baseline.get((result["clusters"], result["stage"]))
+        if before and result["wall"] - before["wall"] > max(before["wall"] * tolerance, min_delta):
+            regressions.append(f"{result['clusters']} clusters / {result['stage']}: "
+                               f"{before['wall']:.3f}s -> {result['wall']:.3f}s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,500,5000", help="Comma separated fleet sizes in clusters")
+    parser.add_argument("--min-pools", type=int, default=5)
+    parser.add_argument("--max-pools", type=int, default=50)
+    parser.add_argument("--max-machines", type=int, default=100_000)
+    parser.add_argument("--backend", choices=("kubectl", "api"), default="kubectl")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Objects per page when listing (default: 500)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Fail if any stage is slower than in this earlier --json file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown for --compare (default: 0.25)")
+    parser.add_argument("--min-delta", type=float, default=0.05,
+                        help="Slowdown in seconds a stage is always allowed for --compare (default: 0.05)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    parser.add_argument("--script", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.script:
+        print(json.dumps(run_script(args.script_args[1:])))
+        return
+    if args.worker:
+        print(json.dumps(run_worker(args.backend, args.chunk_size, args.output)))
+        return
+
+    results = []
+    print(f"{'clusters':>8} {'machines':>9}  {'stage':<20} {'wall (s)':>9} {'kubectl':>8} {'peak RSS (MB)':>14}")
+    for clusters in (int(size) for size in args.sizes.split(",")):
+        for result in bench_size(clusters, args):
+            results.append(result)
+            print(f"{result['clusters']:>8} {result['machines']:>9}  {result['stage']:<20} "
+                  f"{result['wall']:>9.3f} {result['subprocesses']:>8} {result['peak_rss_mb']:>14.1f}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance, args.min_delta)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
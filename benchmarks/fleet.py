@@ -0,0 +1,333 @@
+"""Synthetic NKP objects shaped like the ones found on a real management cluster."""
+
+import json
+import uuid
+
+PROVIDER_LABEL = "cluster.x-k8s.io/provider"
+
+def conditions(*types: str) -> list:
+    return [{"type": condition_type, "status": "True", "lastTransitionTime": "2024-08-20T10:15:42Z"}
+            for condition_type in types]
+
+def machine_details(prism_cluster: str, subnet: str, vcpus: int, memory: str) -> dict:
+    return {
+        "bootType": "uefi",
+        "cluster": {"name": prism_cluster, "type": "name"},
+        "image": {"name": "nkp-rocky-9.4-release-1.29.6-20240816215147", "type": "name"},
+        "memorySize": memory,
+        "subnets": [{"name": subnet, "type": "name"}],
+        "systemDiskSize": "80Gi",
+        "vcpuSockets": vcpus,
+        "vcpusPerSocket": 1,
+    }
+
+def make_cluster(name: str, namespace: str, pools: int = 2, prism_cluster: str = "pe-01",
+                 subnet: str = "vlan-100", version: str = "v1.29.6") -> dict:
+    cluster_config = {
+        "addons": {
+            "ccm": {"credentials": {"secretRef": {"name": f"{name}-pc-credentials"}}},
+            "clusterAutoscaler": {"strategy": "ClusterResourceSet"},
+            "cni": {"provider": "Cilium"},
+            "csi": {
+                "defaultStorage": {"provider": "nutanix", "storageClassConfig": "volume"},
+                "providers": {"nutanix": {
+                    "credentials": {"secretRef": {"name": f"{name}-pc-credentials-for-csi"}},
+                    "storageClassConfigs": {"volume": {
+                        "allowExpansion": True,
+                        "parameters": {
+                            "csi.storage.k8s.io/fstype": "ext4",
+                            "description": f"CSI StorageClass nutanix-volume for {name}",
+                            "flashMode": "DISABLED",
+                            "hypervisorAttached": "ENABLED",
+                            "storageContainer": "default-container",
+                            "storageType": "NutanixVolumes",
+                        },
+                        "reclaimPolicy": "Delete",
+                        "volumeBindingMode": "WaitForFirstConsumer",
+                    }},
+                    "strategy": "HelmAddon",
+                }},
+                "snapshotController": {"strategy": "HelmAddon"},
+            },
+            "nfd": {"strategy": "ClusterResourceSet"},
+            "serviceLoadBalancer": {
+                "configuration": {"addressRanges": [{"start": "10.0.100.200", "end": "10.0.100.220"}]},
+                "provider": "MetalLB",
+            },
+        },
+        "controlPlane": {"nutanix": {"machineDetails": machine_details(prism_cluster, subnet, 4, "16Gi")}},
+        "dns": {"coreDNS": {}},
+        "encryptionAtRest": {"providers": [{"aescbc": {}}]},
+        "globalImageRegistryMirror": {"url": "https://registry.example.com/mirror"},
+        "imageRegistries": [{"url": "https://registry.example.com", "credentials": {"secretRef": {"name": "registry-creds"}}}],
+        "nutanix": {
+            "controlPlaneEndpoint": {"host": "10.0.100.10", "port": 6443, "virtualIP": {"provider": "KubeVIP"}},
+            "prismCentralEndpoint": {
+                "credentials": {"secretRef": {"name": f"{name}-pc-credentials"}},
+                "insecure": False,
+                "url": "https://prism-central.example.com:9440",
+            },
+        },
+        "users": [{"name": "konvoy", "sshAuthorizedKeys": ["ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAI" + "x" * 40]}],
+    }
+    workers = [{
+        "class": "default-worker",
+        "metadata": {"annotations": {"cluster.x-k8s.io/cluster-api-autoscaler-node-group-min-size": "2"}},
+        "name": f"md-{index}",
+        "replicas": 4,
+        "variables": {"overrides": [{"name": "workerConfig", "value": {
+            "nutanix": {"machineDetails": machine_details(prism_cluster, subnet, 8, "32Gi")},
+        }}]},
+    } for index in range(pools)]
+
+    return {
+        "apiVersion": "cluster.x-k8s.io/v1beta1",
+        "kind": "Cluster",
+        "metadata": {
+            "name": name,
+            "namespace": namespace,
+            "uid": str(uuid.uuid5(uuid.NAMESPACE_URL, f"clusters/{namespace}/{name}")),
+            "resourceVersion": "1",
+            "labels": {
+                "cluster.x-k8s.io/cluster-name": name,
+                PROVIDER_LABEL: "nutanix",
+                "topology.cluster.x-k8s.io/owned": "",
+            },
+        },
+        "spec": {
+            "clusterNetwork": {"pods": {"cidrBlocks": ["192.168.0.0/16"]}, "services": {"cidrBlocks": ["10.96.0.0/12"]}},
+            "controlPlaneEndpoint": {"host": "10.0.100.10", "port": 6443},
+            "controlPlaneRef": {
+                "apiVersion": "controlplane.cluster.x-k8s.io/v1beta1",
+                "kind": "KubeadmControlPlane",
+                "name": f"{name}-cp",
+                "namespace": namespace,
+            },
+            "topology": {
+                "class": "nkp-nutanix-v2.12.0",
+                "controlPlane": {"replicas": 3},
+                "variables": [{"name": "clusterConfig", "value": cluster_config}],
+                "version": version,
+                "workers": {"machineDeployments": workers},
+            },
+        },
+        "status": {
+            "phase": "Provisioned",
+            "controlPlaneReady": True,
+            "infrastructureReady": True,
+            "observedGeneration": 4,
+            "conditions": conditions("Ready", "ControlPlaneInitialized", "ControlPlaneReady", "InfrastructureReady",
+                                     "TopologyReconciled"),
+        },
+    }
+
+def make_machines(cluster: dict, machines_per_pool: int = 2) -> list:
+    """Machines of one cluster, labelled the way CAPI labels them."""
+    name = cluster["metadata"]["name"]
+    namespace = cluster["metadata"]["namespace"]
+    control_plane = cluster["spec"]["controlPlaneRef"]["name"]
+    replicas = cluster["spec"]["topology"]["controlPlane"]["replicas"]
+
+    def machine(machine_name, labels, owner_kind, owner_name):
+        return {
+            "apiVersion": "cluster.x-k8s.io/v1beta1",
+            "kind": "Machine",
+            "metadata": {
+                "name": machine_name,
+                "namespace": namespace,
+                "uid": str(uuid.uuid5(uuid.NAMESPACE_URL, f"machines/{namespace}/{machine_name}")),
+                "resourceVersion": "1",
+                "labels": {"cluster.x-k8s.io/cluster-name": name, **labels},
+                "ownerReferences": [{"apiVersion": "cluster.x-k8s.io/v1beta1", "kind": owner_kind,
+                                     "name": owner_name, "controller": True}],
+            },
+            "spec": {
+                "bootstrap": {
+                    "configRef": {"apiVersion": "bootstrap.cluster.x-k8s.io/v1beta1", "kind": "KubeadmConfig",
+                                  "name": machine_name, "namespace": namespace},
+                    "dataSecretName": machine_name,
+                },
+                "clusterName": name,
+                "infrastructureRef": {"apiVersion": "infrastructure.cluster.x-k8s.io/v1beta1",
+                                      "kind": "NutanixMachine", "name": machine_name, "namespace": namespace},
+                "nodeDeletionTimeout": "10s",
+                "providerID": f"nutanix://{uuid.uuid5(uuid.NAMESPACE_URL, machine_name)}",
+                "version": cluster["spec"]["topology"]["version"],
+            },
+            "status": {
+                "addresses": [{"type": "InternalIP", "address": "10.0.100.50"},
+                              {"type": "Hostname", "address": machine_name}],
+                "bootstrapReady": True,
+                "conditions": conditions("Ready", "BootstrapReady", "DrainingSucceeded", "HealthCheckSucceeded",
+                                         "InfrastructureReady", "NodeHealthy"),
+                "infrastructureReady": True,
+                "lastUpdated": "2024-08-20T10:21:07Z",
+                "nodeInfo": {"architecture": "amd64", "containerRuntimeVersion": "containerd://1.7.20",
+                             "kernelVersion": "5.14.0-427.28.1.el9_4.x86_64",
+                             "kubeProxyVersion": cluster["spec"]["topology"]["version"],
+                             "kubeletVersion": cluster["spec"]["topology"]["version"],
+                             "operatingSystem": "linux", "osImage": "Rocky Linux 9.4 (Blue Onyx)"},
+                "nodeRef": {"apiVersion": "v1", "kind": "Node", "name": machine_name,
+                            "uid": str(uuid.uuid5(uuid.NAMESPACE_URL, f"nodes/{machine_name}"))},
+                "observedGeneration": 3,
+                "phase": "Running",
+            },
+        }
+
+    machines = [machine(f"{control_plane}-{index:05d}",
+                        {"cluster.x-k8s.io/control-plane": "",
+                         "cluster.x-k8s.io/control-plane-name": control_plane},
+                        "KubeadmControlPlane", control_plane)
+                for index in range(replicas)]
+    for pool in cluster["spec"]["topology"]["workers"]["machineDeployments"]:
+        deployment = f"{name}-{pool['name']}-x7k2p"
+        machines += [machine(f"{deployment}-{index:05d}",
+                             {"cluster.x-k8s.io/deployment-name": deployment,
+                              "topology.cluster.x-k8s.io/deployment-name": pool["name"]},
+                             "MachineSet", f"{deployment}-5d8f9")
+                     for index in range(machines_per_pool)]
+    return machines
+
+def make_pool_controllers(cluster: dict, machines_per_pool: int = 2) -> tuple:
+    """The KubeadmControlPlane and MachineDeployments of one cluster, owned by it and fully rolled out."""
+    name = cluster["metadata"]["name"]
+    namespace = cluster["metadata"]["namespace"]
+    version = cluster["spec"]["topology"]["version"]
+    owner = [{"apiVersion": "cluster.x-k8s.io/v1beta1", "kind": "Cluster", "name": name,
+              "uid": cluster["metadata"]["uid"]}]
+
+    def metadata(resource, object_name, labels):
+        return {"name": object_name, "namespace": namespace,
+                "uid": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{resource}/{namespace}/{object_name}")),
+                "resourceVersion": "1", "labels": {"cluster.x-k8s.io/cluster-name": name, **labels},
+                "ownerReferences": owner}
+
+    def status(replicas):
+        return {"replicas": replicas, "readyReplicas": replicas, "updatedReplicas": replicas,
+                "availableReplicas": replicas, "observedGeneration": 2,
+                "conditions": conditions("Ready", "Available")}
+
+    replicas = cluster["spec"]["topology"]["controlPlane"]["replicas"]
+    control_plane = {
+        "apiVersion": "controlplane.cluster.x-k8s.io/v1beta1",
+        "kind": "KubeadmControlPlane",
+        "metadata": metadata("kubeadmcontrolplanes", cluster["spec"]["controlPlaneRef"]["name"],
+                             {"topology.cluster.x-k8s.io/owned": ""}),
+        "spec": {"replicas": replicas, "version": version, "rolloutStrategy": {"type": "RollingUpdate"}},
+        "status": {**status(replicas), "initialized": True, "ready": True, "version": version},
+    }
+    deployments = []
+    for pool in cluster["spec"]["topology"]["workers"]["machineDeployments"]:
+        deployments.append({
+            "apiVersion": "cluster.x-k8s.io/v1beta1",
+            "kind": "MachineDeployment",
+            "metadata": metadata("machinedeployments", f"{name}-{pool['name']}-x7k2p",
+                                 {"topology.cluster.x-k8s.io/deployment-name": pool["name"],
+                                  "topology.cluster.x-k8s.io/owned": ""}),
+            "spec": {"clusterName": name, "replicas": machines_per_pool,
+                     "template": {"spec": {"clusterName": name, "version": version}}},
+            "status": {**status(machines_per_pool), "phase": "Running"},
+        })
+    return control_plane, deployments
+
+def make_nodes(machines: list) -> list:
+    """The Nodes behind ``machines``, annotated with their cluster the way CAPI annotates them."""
+    nodes = []
+    for machine in machines:
+        cluster_name = machine["spec"]["clusterName"]
+        control_plane = "cluster.x-k8s.io/control-plane" in machine["metadata"]["labels"]
+        nodes.append({
+            "apiVersion": "v1",
+            "kind": "Node",
+            "metadata": {
+                "name": machine["status"]["nodeRef"]["name"],
+                "uid": machine["status"]["nodeRef"]["uid"],
+                "resourceVersion": "1",
+                "annotations": {"cluster.x-k8s.io/cluster-name": cluster_name,
+                                "cluster.x-k8s.io/cluster-namespace": machine["metadata"]["namespace"],
+                                "cluster.x-k8s.io/machine": machine["metadata"]["name"]},
+                "labels": {"kubernetes.io/hostname": machine["status"]["nodeRef"]["name"],
+                           **({"node-role.kubernetes.io/control-plane": ""} if control_plane else {})},
+            },
+            "spec": {"providerID": machine["spec"]["providerID"]},
+            "status": {
+                "addresses": machine["status"]["addresses"],
+                "allocatable": {"cpu": "3800m" if control_plane else "7800m", "ephemeral-storage": "75Gi",
+                                "memory": "15896664Ki" if control_plane else "32160344Ki", "pods": "110"},
+                "capacity": {"cpu": "4" if control_plane else "8", "ephemeral-storage": "80Gi",
+                             "memory": "16266328Ki" if control_plane else "32777336Ki", "pods": "110"},
+                "conditions": [{"type": "MemoryPressure", "status": "False"}, {"type": "DiskPressure", "status": "False"},
+                               {"type": "PIDPressure", "status": "False"}, {"type": "Ready", "status": "True"}],
+                "nodeInfo": machine["status"]["nodeInfo"],
+            },
+        })
+    return nodes
+
+def make_kommander_configmap(cluster_name: str, version: str = "v2.12.0") -> dict:
+    return {
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {
+            "name": "kommander-bootstrap-configuration",
+            "namespace": "default",
+            "uid": str(uuid.uuid5(uuid.NAMESPACE_URL, "configmaps/default/kommander-bootstrap-configuration")),
+            "resourceVersion": "1",
+            "labels": {"konvoy.d2iq.io/cluster-name": cluster_name},
+        },
+        "data": {"kommander-install.yaml": (
+            "apiVersion: config.kommander.mesosphere.io/v1alpha1\n"
+            "kind: Installation\n"
+            f"version: {version}\n"
+            "airgapped:\n"
+            "  enabled: true\n"
+        )},
+    }
+
+def make_license(level: str = "Ultimate") -> dict:
+    return {
+        "apiVersion": "kommander.mesosphere.io/v1beta1",
+        "kind": "License",
+        "metadata": {"name": "nkp-license", "namespace": "kommander",
+                     "uid": str(uuid.uuid5(uuid.NAMESPACE_URL, "licenses/kommander/nkp-license")),
+                     "resourceVersion": "1"},
+        "status": {"dkpLevel": level},
+    }
+
+def make_fleet(clusters: int, min_pools: int = 5, max_pools: int = 50, max_machines: int = 100_000,
+               with_nodes: bool = False) -> dict:
+    """A management cluster named ``mgmt`` plus ``clusters - 1`` workload clusters.
+
+    Pool counts cycle between ``min_pools`` and ``max_pools``; pools and
+    machines per pool are reduced so the fleet stays within ``max_machines``.
+    ``with_nodes`` adds the workload clusters' Nodes, for the stub API server
+    to serve as each cluster's own API.
+    """
+    pool_counts = [min_pools + index % (max_pools - min_pools + 1) for index in range(clusters)]
+    # Very large fleets get fewer pools per cluster so every pool keeps at least one machine
+    pool_budget = max(1, max_machines // clusters - 3)
+    pool_counts = [min(pools, pool_budget) for pools in pool_counts]
+    total_pools = sum(pool_counts)
+    machines_per_pool = max(1, min(3, (max_machines - 3 * clusters) // max(total_pools, 1)))
+
+    fleet = {"clusters": [], "machines": [], "machinedeployments": [], "kubeadmcontrolplanes": []}
+    for index, pools in enumerate(pool_counts):
+        name, namespace = ("mgmt", "default") if index == 0 else (f"workload-{index:05d}", f"workspace-{index % 25:02d}")
+        cluster = make_cluster(name, namespace, pools, prism_cluster=f"pe-{index % 4:02d}",
+                               subnet=f"vlan-{100 + index % 8}", version=("v1.29.6", "v1.30.5")[index % 2])
+        fleet["clusters"].append(cluster)
+        fleet["machines"] += make_machines(cluster, machines_per_pool)
+        control_plane, deployments = make_pool_controllers(cluster, machines_per_pool)
+        fleet["kubeadmcontrolplanes"].append(control_plane)
+        fleet["machinedeployments"] += deployments
+    fleet["configmaps"] = [make_kommander_configmap("mgmt")]
+    fleet["licenses"] = [make_license()]
+    if with_nodes:
+        fleet["nodes"] = make_nodes(fleet["machines"])
+    return fleet
+
+def write_fleet(fleet: dict, directory: str):
+    """Write one ``<resource>.json`` list per resource, as served by the fake kubectl and stub API server."""
+    for resource, items in fleet.items():
+        with open(f"{directory}/{resource}.json", "w") as file:
+            json.dump({"apiVersion": "v1", "kind": "List", "metadata": {"resourceVersion": "1"}, "items": items},
+                      file, separators=(",", ":"))
@@ -0,0 +1,345 @@
+"""Minimal stand-in for the Kubernetes API server, serving a synthetic fleet.
+
+Objects come from the ``<resource>.json`` files written by
+``benchmarks.fleet.write_fleet``. Lists (paged with ``limit``/``continue``
+and filtered by ``labelSelector``/``fieldSelector``), gets, metadata-only lists (PartialObjectMetadataList), Tables of the
+printer columns and watches are supported; watch events are pushed with ``StubApiServer.emit``.
+
+The server also stands in for every workload cluster: it serves a
+``<cluster>-kubeconfig`` Secret for each Cluster pointing back at itself under
+``/clusters/<namespace>/<name>``, where only that cluster's Nodes are listed.
+Workload clusters named in ``stalled`` never answer, to exercise timeouts.
+
+To exercise retries, ``latency`` delays every request, requests beyond
+``max_inflight`` at once are answered 429 like API Priority and Fairness does,
+and every ``fail_every``-th request is answered 503.
+
+Run standalone to point the scripts at a recorded or synthetic fleet:
+
+    python benchmarks/stub_apiserver.py FLEET_DIR --port 8001 --kubeconfig stub.conf
+    KUBECONFIG=stub.conf python nkp-as-built.py --backend api
+"""
+
+import argparse
+import base64
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nkp_inventory.kube import matches_selectors
+
+# How long a stalled workload cluster holds a request before dropping it
+STALL_SECONDS = 3600
+
+def split_workload(path: str) -> tuple:
+    """Return ``((namespace, name), rest)`` for ``/clusters/<namespace>/<name>/...``, else ``(None, path)``."""
+    parts = path.split("/", 4)
+    if len(parts) == 5 and parts[1] == "clusters":
+        return (parts[2], parts[3]), "/" + parts[4]
+    return None, path
+
+def kubeconfig_secret(cluster: dict, server: str) -> dict:
+    name, namespace = cluster["metadata"]["name"], cluster["metadata"]["namespace"]
+    kubeconfig = {
+        "apiVersion": "v1",
+        "kind": "Config",
+        "current-context": f"{name}-admin@{name}",
+        "contexts": [{"name": f"{name}-admin@{name}", "context": {"cluster": name, "user": f"{name}-admin"}}],
+        "clusters": [{"name": name, "cluster": {"server": f"{server}/clusters/{namespace}/{name}"}}],
+        "users": [{"name": f"{name}-admin", "user": {"token": "stub"}}],
+    }
+    return {
+        "apiVersion": "v1",
+        "kind": "Secret",
+        "type": "cluster.x-k8s.io/secret",
+        "metadata": {"name": f"{name}-kubeconfig", "namespace": namespace, "uid": f"secret-{cluster['metadata']['uid']}",
+                     "resourceVersion": "1", "labels": {"cluster.x-k8s.io/cluster-name": name}},
+        "data": {"value": base64.b64encode(json.dumps(kubeconfig).encode()).decode()},
+    }
+
+def parse_path(path: str) -> tuple:
+    """Return ``(resource, namespace, name)`` for a core or group API path."""
+    parts = path.strip("/").split("/")
+    parts = parts[2:] if parts[0] == "api" else parts[3:]
+    namespace = None
+    if len(parts) >= 3 and parts[0] == "namespaces":
+        namespace, parts = parts[1], parts[2:]
+    return parts[0], namespace, parts[1] if len(parts) > 1 else None
+
+# Printer columns of the served resources, as declared by their CRDs
+PRINTER_COLUMNS = {
+    "clusters": [("ClusterClass", ("spec", "topology", "class")), ("Phase", ("status", "phase")),
+                 ("Version", ("spec", "topology", "version"))],
+    "machines": [("Cluster", ("spec", "clusterName")), ("NodeName", ("status", "nodeRef", "name")),
+                 ("Phase", ("status", "phase")), ("Version", ("spec", "version"))],
+    "machinedeployments": [("Cluster", ("spec", "clusterName")), ("Desired", ("spec", "replicas")),
+                           ("Replicas", ("status", "replicas")), ("Ready", ("status", "readyReplicas")),
+                           ("Updated", ("status", "updatedReplicas")),
+                           ("Unavailable", ("status", "unavailableReplicas")), ("Phase", ("status", "phase")),
+                           ("Version", ("spec", "template", "spec", "version"))],
+    "kubeadmcontrolplanes": [("Cluster", ("metadata", "labels", "cluster.x-k8s.io/cluster-name")),
+                             ("Initialized", ("status", "initialized")),
+                             ("API Server Available", ("status", "ready")), ("Desired", ("spec", "replicas")),
+                             ("Replicas", ("status", "replicas")), ("Ready", ("status", "readyReplicas")),
+                             ("Updated", ("status", "updatedReplicas")),
+                             ("Unavailable", ("status", "unavailableReplicas")), ("Version", ("spec", "version"))],
+}
+
+def lookup(obj: dict, path: tuple):
+    for key in path:
+        obj = obj.get(key) if isinstance(obj, dict) else None
+    return obj
+
+def to_table(page: dict, resource: str, include_object: str) -> dict:
+    columns = [("Name", ("metadata", "name"))] + PRINTER_COLUMNS.get(resource, [])
+    rows = []
+    for item in page["items"]:
+        row = {"cells": [lookup(item, path) for _, path in columns]}
+        if include_object == "Metadata":
+            row["object"] = {"kind": "PartialObjectMetadata", "apiVersion": "meta.k8s.io/v1",
+                             "metadata": item["metadata"]}
+        elif include_object == "Object":
+            row["object"] = item
+        rows.append(row)
+    return {"kind": "Table", "apiVersion": "meta.k8s.io/v1", "metadata": page["metadata"],
+            "columnDefinitions": [{"name": name, "type": "string"} for name, _ in columns], "rows": rows}
+
+def paginate(items: list, params: dict, resource_version: int) -> dict:
+    """Build one page of a list for the ``limit`` and ``continue`` query parameters."""
+    start = int(params.get("continue") or 0)
+    limit = int(params.get("limit") or 0)
+    end = start + limit if limit else len(items)
+    metadata = {"resourceVersion": str(resource_version)}
+    if end < len(items):
+        metadata["continue"] = str(end)
+    return {"kind": "List", "metadata": metadata, "items": items[start:end]}
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        workload, path = split_workload(url.path)
+        resource, namespace, name = parse_path(path)
+        self.server.requests.append(self.path)
+        if workload and workload[1] in self.server.stalled:
+            time.sleep(STALL_SECONDS)
+            return
+
+        if params.get("watch") in ("1", "true"):
+            return self._watch(resource, namespace)
+
+        if params.get("continue") and self.server.expire_continue:
+            return self._send(410, {"kind": "Status", "code": 410, "reason": "Expired",
+                                    "message": "The provided continue parameter is too old"})
+
+        rejected = self.server.admit()
+        if rejected:
+            return self._send(rejected, {"kind": "Status", "code": rejected, "message": "stub rejected the request"},
+                              {"Retry-After": "1"} if rejected == 429 else {})
+        try:
+            time.sleep(self.server.latency)
+            self._list_or_get(resource, namespace, name, workload, params)
+        finally:
+            self.server.release()
+
+    def _list_or_get(self, resource: str, namespace: str, name: str, workload: tuple, params: dict):
+        items = self.server.items(resource)
+        if items is None:
+            return self._send(404, {"kind": "Status", "code": 404, "message": f"{resource} not found"})
+        if namespace:
+            items = [item for item in items if item["metadata"].get("namespace") == namespace]
+        if "labelSelector" in params or "fieldSelector" in params:
+            items = [item for item in items if matches_selectors(item, params)]
+        if workload:
+            items = [item for item in items
+                     if (item["metadata"].get("annotations", {}).get("cluster.x-k8s.io/cluster-namespace"),
+                         item["metadata"].get("annotations", {}).get("cluster.x-k8s.io/cluster-name")) == workload]
+        if name:
+            match = next((item for item in items if item["metadata"]["name"] == name), None)
+            if match is None:
+                return self._send(404, {"kind": "Status", "code": 404, "message": f'{resource} "{name}" not found'})
+            return self._send(200, match)
+
+        accept = self.headers.get("Accept", "")
+        if "PartialObjectMetadataList" in accept:
+            items = [{"metadata": item["metadata"]} for item in items]
+        page = paginate(items, params, self.server.resource_version)
+        if "as=Table" in accept and self.server.tables:
+            page = to_table(page, resource, params.get("includeObject", "Metadata"))
+        self._send(200, page)
+
+    def _watch(self, resource: str, namespace: str):
+        events = self.server.subscribe(resource)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                if namespace and event["object"]["metadata"].get("namespace") != namespace:
+                    continue
+                line = (json.dumps(event) + "\n").encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            pass
+        finally:
+            self.server.unsubscribe(resource, events)
+
+    def _send(self, status: int, obj: dict, headers: dict = None):
+        body = json.dumps(obj, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fleet_dir: str, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), StubHandler)
+        self.fleet_dir = fleet_dir
+        self.resource_version = 1
+        self.requests = []
+        self.stalled = set()
+        self.latency = 0.0
+        self.max_inflight = None
+        self.fail_every = None
+        # Whether Table requests get a Table; without, the plain list is sent like an aggregated API would
+        self.tables = True
+        # Answer every request for a further page with 410 Gone, as after etcd compaction
+        self.expire_continue = False
+        self._inflight = 0
+        self._items = {}
+        self._watchers = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def items(self, resource: str):
+        with self._lock:
+            if resource not in self._items:
+                path = os.path.join(self.fleet_dir, f"{resource}.json")
+                if resource == "secrets" and not os.path.exists(path):
+                    self._items[resource] = [kubeconfig_secret(cluster, self.url) for cluster in self._clusters()]
+                    return self._items[resource]
+                if not os.path.exists(path):
+                    return None
+                with open(path) as file:
+                    self._items[resource] = json.load(file)["items"]
+            return self._items[resource]
+
+    def admit(self) -> int:
+        """Status to reject the next request with, or 0 to serve it (then call ``release``)."""
+        with self._lock:
+            if self.fail_every and len(self.requests) % self.fail_every == 0:
+                return 503
+            if self.max_inflight and self._inflight >= self.max_inflight:
+                return 429
+            self._inflight += 1
+            return 0
+
+    def release(self):
+        with self._lock:
+            self._inflight -= 1
+
+    def _clusters(self) -> list:
+        with open(os.path.join(self.fleet_dir, "clusters.json")) as file:
+            return json.load(file)["items"]
+
+    def subscribe(self, resource: str) -> queue.Queue:
+        events = queue.Queue()
+        with self._lock:
+            self._watchers.setdefault(resource, []).append(events)
+        return events
+
+    def unsubscribe(self, resource: str, events: queue.Queue):
+        with self._lock:
+            self._watchers[resource].remove(events)
+
+    def watching(self, resource: str) -> int:
+        """Number of open watches on ``resource``."""
+        with self._lock:
+            return len(self._watchers.get(resource, []))
+
+    def drop_watches(self, resource: str):
+        """End every open watch on ``resource``, as an apiserver restart or load balancer would."""
+        with self._lock:
+            for events in self._watchers.get(resource, []):
+                events.put(None)
+
+    def emit(self, resource: str, event_type: str, obj: dict):
+        """Apply a change to the served objects and send it to every watcher of ``resource``."""
+        items = self.items(resource) or []
+        with self._lock:
+            self.resource_version += 1
+            obj["metadata"]["resourceVersion"] = str(self.resource_version)
+            uid = obj["metadata"]["uid"]
+            items[:] = [item for item in items if item["metadata"]["uid"] != uid]
+            if event_type != "DELETED":
+                items.append(obj)
+            self._items[resource] = items
+            for events in self._watchers.get(resource, []):
+                events.put({"type": event_type, "object": obj})
+
+    def start(self) -> "StubApiServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def write_kubeconfig(self, path: str):
+        with open(path, "w") as file:
+            json.dump({
+                "apiVersion": "v1",
+                "kind": "Config",
+                "current-context": "stub",
+                "contexts": [{"name": "stub", "context": {"cluster": "stub", "user": "stub"}}],
+                "clusters": [{"name": "stub", "cluster": {"server": self.url}}],
+                "users": [{"name": "stub", "user": {"token": "stub"}}],
+            }, file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic fleet like a Kubernetes API server")
+    parser.add_argument("fleet_dir")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--kubeconfig", help="Write a kubeconfig pointing at the stub server to this file")
+    parser.add_argument("--stall-cluster", action="append", default=[], metavar="NAME",
+                        help="Never answer requests to this workload cluster (repeatable)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to hold every request")
+    parser.add_argument("--max-inflight", type=int, help="Answer 429 beyond this many requests at once")
+    parser.add_argument("--fail-every", type=int, metavar="N", help="Answer every Nth request with 503")
+    args = parser.parse_args()
+
+    server = StubApiServer(args.fleet_dir, args.host, args.port)
+    server.stalled.update(args.stall_cluster)
+    server.latency = args.latency
+    server.max_inflight = args.max_inflight
+    server.fail_every = args.fail_every
+    if args.kubeconfig:
+        server.write_kubeconfig(args.kubeconfig)
+    print(f"Serving {args.fleet_dir} on {server.url}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+
+from nkp_inventory.history import DEFAULT_HISTORY, HistoryStore
+
+def print_snapshots(store, source=None, limit=None):
+    print(f"{'ID':>5}  {'Taken at (UTC)':<20}  {'Clusters':>8}  {'NKP Version':<12}  "
+          "Kommander Cluster / Source / Scope")
+    for snapshot_id, taken_at, source_, kommander, version, scope, clusters in store.snapshots(source, limit):
+        details = " / ".join(value for value in (kommander, source_, scope) if value)
+        print(f"{snapshot_id:>5}  {taken_at:<20}  {clusters:>8}  {version or 'N/A':<12}  {details}")
+
+def describe(snapshot) -> str:
+    snapshot_id, taken_at, source, kommander, version, scope = snapshot
+    text = f"snapshot {snapshot_id} ({taken_at}, {kommander or source}, NKP {version or 'N/A'})"
+    return f"{text} [{scope}]" if scope else text
+
+def print_diff(store, old: int, new: int):
+    old_snapshot, new_snapshot = store.snapshot(old), store.snapshot(new)
+    print(f"From {describe(old_snapshot)}")
+    print(f"To   {describe(new_snapshot)}")
+    if old_snapshot[2] != new_snapshot[2]:
+        print("Note: the snapshots come from different management clusters")
+    if old_snapshot[5] != new_snapshot[5]:
+        print("Note: the snapshots cover different parts of the fleet; clusters outside either are added or removed")
+
+    changes = store.diff(old, new)
+    sections = [
+        ("Clusters added", [f"+ {ns}/{name} ({version})" for ns, name, version in changes["clusters_added"]]),
+        ("Clusters removed", [f"- {ns}/{name} ({version})" for ns, name, version in changes["clusters_removed"]]),
+        ("Kubernetes version changes", [f"{ns}/{name}: {before} -> {after}"
+                                        for ns, name, before, after in changes["version_changes"]]),
+        ("Machine count changes", [
+            f"{ns}/{cluster} {role} {pool}: "
+            + (f"added with {after}" if before is None else f"removed, had {before}" if after is None
+               else f"{before} -> {after}")
+            for ns, cluster, role, pool, before, after in changes["machine_changes"]]),
+        ("Config changes", [f"{ns}/{cluster}{' ' + pool if pool else ''}: {key}: {before} -> {after}"
+                            for ns, cluster, pool, key, before, after in changes["config_changes"]]),
+    ]
+    if not any(lines for _, lines in sections):
+        print("\nNo changes")
+    for title, lines in sections:
+        if lines:
+            print(f"\n{title} ({len(lines)}):")
+            for line in lines:
+                print(f"  {line}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Browse and compare the inventory snapshots saved by earlier runs")
+    parser.add_argument(
+        "--history",
+        metavar="DB",
+        default=DEFAULT_HISTORY,
+        help=f"SQLite file the runs saved their snapshots to (default: {DEFAULT_HISTORY})"
+    )
+    parser.add_argument(
+        "--source",
+        help="Only consider snapshots of this management cluster (the API server or kubeconfig shown by 'snapshots')"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshots = commands.add_parser("snapshots", help="List the saved snapshots, newest first")
+    snapshots.add_argument("--limit", type=int, default=20, help="Show at most this many (default: 20, 0 for all)")
+    diff = commands.add_parser(
+        "diff",
+        help="Show what changed between two snapshots",
+        description="Snapshots are named by ID, 'latest', 'latest~N' (N snapshots before the latest) "
+                    "or a UTC date or time such as 2026-09-30 or 2026-09-30T12:00:00Z (the last snapshot taken by then)"
+    )
+    diff.add_argument("old", nargs="?", default="latest~1", help="Snapshot to compare from (default: latest~1)")
+    diff.add_argument("new", nargs="?", default="latest", help="Snapshot to compare to (default: latest)")
+    args = parser.parse_args()
+    if not os.path.exists(args.history):
+        sys.exit(f"Error: no history at {args.history}; it is created by the first nkp-as-built.py run")
+
+    store = HistoryStore(args.history)
+    try:
+        if args.command == "snapshots":
+            print_snapshots(store, args.source, args.limit)
+        else:
+            try:
+                old, new = store.resolve(args.old, args.source), store.resolve(args.new, args.source)
+            except LookupError as e:
+                sys.exit(f"Error: {e}")
+            print_diff(store, old, new)
+    finally:
+        store.close()
@@ -0,0 +1 @@
+"""Shared collection code for the NKP as-built inventory scripts."""
@@ -0,0 +1,127 @@
+"""Offline capture bundles.
+
+``CapturingBackend`` records every object the collectors read into a bundle
+directory of gzipped JSON files. ``BundleBackend`` serves those files back
+through the same get/list interface, so a report can be regenerated (or
+profiled) away from the customer site with no cluster access at all.
+"""
+
+import gzip
+import json
+import os
+import time
+
+from nkp_inventory.kube import KubeError, matches_selectors, project
+
+MANIFEST = "manifest.json"
+# Credentials are read when needed but never written into a bundle
+NOT_CAPTURED = {"secrets"}
+
+def _bundle_file(directory: str, resource: str, namespace: str = None, name: str = None) -> str:
+    parts = [resource, namespace or "_all"]
+    if name:
+        parts.append(name)
+    return os.path.join(directory, "--".join(parts) + ".json.gz")
+
+class CapturingBackend:
+    def __init__(self, backend, directory: str):
+        self.backend = backend
+        self.name = backend.name
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, MANIFEST), "w") as file:
+            json.dump({"captured_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                       "source": backend.cache_key}, file)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _save(self, path: str, obj: dict) -> dict:
+        with gzip.open(path, "wt") as file:
+            json.dump(obj, file, separators=(",", ":"))
+        return obj
+
+    def get(self, resource: str, name: str, namespace: str) -> dict:
+        obj = self.backend.get(resource, name, namespace)
+        if resource in NOT_CAPTURED:
+            return obj
+        return self._save(_bundle_file(self.directory, resource, namespace, name), obj)
+
+    def list(self, resource: str, namespace: str = None, selectors: dict = None) -> dict:
+        result = self.backend.list(resource, namespace, selectors=selectors)
+        return self._save(_bundle_file(self.directory, resource, namespace), result)
+
+    def iter_items(self, resource: str, namespace: str = None, selectors: dict = None):
+        """Pass the objects through while writing them to the bundle as one list.
+
+        A selected list is saved as the list itself; reading the bundle with
+        the same or narrower selectors gives the same objects back.
+        """
+        path = _bundle_file(self.directory, resource, namespace)
+        temp_path = f"{path}.tmp"
+        with gzip.open(temp_path, "wt") as file:
+            file.write('{"items":[')
+            for index, item in enumerate(self.backend.iter_items(resource, namespace, selectors)):
+                if index:
+                    file.write(",")
+                json.dump(item, file, separators=(",", ":"))
+                yield item
+            file.write("]}")
+        # Only a list that was read to the end ends up in the bundle
+        os.replace(temp_path, path)
+
+    def iter_projected(self, resource: str, fields, namespace: str = None, selectors: dict = None):
+        # Bundles keep whole objects so any later version of the report can be built from them
+        for item in self.iter_items(resource, namespace, selectors):
+            yield project(item, fields)
+
+class BundleBackend:
+    name = "bundle"
+
+    def __init__(self, directory: str):
+        if not os.path.exists(os.path.join(directory, MANIFEST)):
+            raise KubeError(f"{directory} is not a capture bundle (no {MANIFEST})")
+        with open(os.path.join(directory, MANIFEST)) as file:
+            self.manifest = json.load(file)
+        self.directory = directory
+        self.cache_key = f"bundle:{os.path.abspath(directory)}"
+
+    def _load(self, path: str) -> dict:
+        try:
+            with gzip.open(path, "rt") as file:
+                return json.load(file)
+        except FileNotFoundError as e:
+            raise KubeError(f"Not captured in bundle: {os.path.basename(path)}") from e
+
+    def get(self, resource: str, name: str, namespace: str) -> dict:
+        path = _bundle_file(self.directory, resource, namespace, name)
+        if os.path.exists(path):
+            return self._load(path)
+        # Objects captured as part of a list can be served by name too
+        for item in self.list(resource, namespace).get("items", []):
+            if item["metadata"]["name"] == name:
+                return item
+        raise KubeError(f"{resource} {namespace}/{name} not captured in bundle")
+
+    def list(self, resource: str, namespace: str = None, selectors: dict = None) -> dict:
+        path = _bundle_file(self.directory, resource, namespace)
+        if namespace and not os.path.exists(path):
+            # Fall back to an all-namespaces capture of the same resource
+            items = self._load(_bundle_file(self.directory, resource))["items"]
+            result = {"items": [item for item in items if item["metadata"].get("namespace") == namespace]}
+        else:
+            result = self._load(path)
+        if selectors:
+            result["items"] = [item for item in result["items"] if matches_selectors(item, selectors)]
+        return result
+
+    def iter_metadata(self, resource: str, namespace: str = None, selectors: dict = None):
+        for item in self.list(resource, namespace, selectors)["items"]:
+            yield {"metadata": item["metadata"]}
+
+    def iter_items(self, resource: str, namespace: str = None, selectors: dict = None):
+        yield from self.list(resource, namespace, selectors)["items"]
+
+    def iter_projected(self, resource: str, fields, namespace: str = None, selectors: dict = None):
+        for item in self.iter_items(resource, namespace, selectors):
+            yield project(item, fields)
@@ -0,0 +1,169 @@
+"""On-disk snapshot cache of the objects read from the API server.
+
+``CachingBackend`` wraps another backend. For every list of a cached resource
+it first asks the API server for metadata only, compares each object's
+``uid`` and ``resourceVersion`` with the snapshot saved by the previous run,
+and then downloads just the objects that were added or changed. Unchanged
+objects are taken from the snapshot. The metadata is compared a page at a
+time and objects are passed on as they are read, while the new snapshot is
+written, so only the previous snapshot and one page are held in memory.
+Projected lists (only some fields of every object) and selected lists get
+snapshots of their own, one per set of fields and selectors.
+
+Only Clusters are cached. Machines and pool controllers are read as Tables of
+a few columns, which are barely larger than their metadata, so for them a
+snapshot would save little and cost a second list.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from itertools import islice
+
+from nkp_inventory.collect import DEFAULT_CONCURRENCY, run_concurrently
+from nkp_inventory.kube import KubeError, project
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "nkp-inventory")
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+# Resources whose objects are much larger than their metadata; everything else is read straight through
+CACHED_RESOURCES = {"clusters"}
+
+# Above this share of changed objects in the first page one full list is cheaper than many gets
+FULL_LIST_RATIO = 0.25
+
+class CachingBackend:
+    def __init__(self, backend, cache_dir: str = DEFAULT_CACHE_DIR, max_age: float = DEFAULT_MAX_AGE,
+                 concurrency: int = DEFAULT_CONCURRENCY):
+        self.backend = backend
+        self.name = backend.name
+        self.cache_key = backend.cache_key
+        # One snapshot directory per management cluster
+        self.cache_dir = os.path.join(cache_dir, hashlib.sha256(backend.cache_key.encode()).hexdigest()[:16])
+        self.max_age = max_age
+        self.concurrency = concurrency
+        self.stats = {"reused": 0, "fetched": 0}
+        self._stats_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _snapshot_path(self, resource: str, namespace: str = None, fields=None, selectors: dict = None) -> str:
+        variant = f"-{hashlib.sha256(repr(fields).encode()).hexdigest()[:8]}" if fields else ""
+        if selectors:
+            variant += f"-s{hashlib.sha256(repr(sorted(selectors.items())).encode()).hexdigest()[:8]}"
+        return os.path.join(self.cache_dir, f"{resource}-{namespace or 'all'}{variant}.json.gz")
+
+    def _load_snapshot(self, path: str) -> dict:
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                return {}
+            with gzip.open(path, "rt") as file:
+                items = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        # Snapshots of older versions were not lists; they are rebuilt
+        return {item["metadata"]["uid"]: item for item in items} if isinstance(items, list) else {}
+
+    def _save_snapshot(self, path: str, items):
+        """Pass ``items`` through while writing them to the snapshot at ``path``.
+
+        The snapshot only replaces the previous one once the list has been
+        read to the end. Each writer gets its own temporary file, so runs
+        sharing the cache (``--targets`` workers) never interleave.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=os.path.basename(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", compresslevel=1) as file:
+                file.write("[")
+                for index, item in enumerate(items):
+                    if index:
+                        file.write(",")
+                    file.write(json.dumps(item, separators=(",", ":")))
+                    yield item
+                file.write("]")
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def _count(self, fetched: int, reused: int = 0):
+        with self._stats_lock:
+            self.stats["fetched"] += fetched
+            self.stats["reused"] += reused
+
+    def get(self, resource: str, name: str, namespace: str) -> dict:
+        return self.backend.get(resource, name, namespace)
+
+    def _read(self, resource: str, namespace: str = None, selectors: dict = None, fields=None):
+        if fields:
+            return self.backend.iter_projected(resource, fields, namespace, selectors)
+        return self.backend.iter_items(resource, namespace, selectors)
+
+    def _full_list(self, resource: str, namespace: str = None, selectors: dict = None, fields=None,
+                   skip: set = frozenset()):
+        for item in self._read(resource, namespace, selectors, fields):
+            if item["metadata"]["uid"] not in skip:
+                self._count(1)
+                yield item
+
+    def _fetch(self, resource: str, meta: dict, fields=None) -> dict:
+        obj = self.backend.get(resource, meta["name"], meta["namespace"])
+        return project(obj, fields) if fields else obj
+
+    def _refreshed(self, snapshot: dict, resource: str, namespace: str = None, selectors: dict = None,
+                   fields=None):
+        """Yield the current objects, taking unchanged ones from ``snapshot``, one page of metadata at a time."""
+        if not snapshot:
+            yield from self._full_list(resource, namespace, selectors, fields)
+            return
+
+        metadata = (item["metadata"] for item in self.backend.iter_metadata(resource, namespace, selectors))
+        page_size = getattr(self.backend, "chunk_size", None) or None
+        yielded = set()
+        while page := list(islice(metadata, page_size)):
+            changed = [meta for meta in page
+                       if snapshot.get(meta["uid"], {}).get("metadata", {}).get("resourceVersion")
+                       != meta["resourceVersion"]]
+            if not yielded and len(changed) > FULL_LIST_RATIO * len(page):
+                metadata.close()
+                yield from self._full_list(resource, namespace, selectors, fields)
+                return
+            try:
+                fresh = run_concurrently([(self._fetch, (resource, meta, fields)) for meta in changed],
+                                         self.concurrency)
+            except KubeError:
+                # An object changed again or was deleted while we were reading it: read the rest in one list
+                metadata.close()
+                yield from self._full_list(resource, namespace, selectors, fields, yielded)
+                return
+
+            fresh = {meta["uid"]: obj for meta, obj in zip(changed, fresh)}
+            self._count(len(fresh), len(page) - len(fresh))
+            for meta in page:
+                yielded.add(meta["uid"])
+                yield fresh.get(meta["uid"]) or snapshot[meta["uid"]]
+
+    def _iter(self, resource: str, namespace: str = None, selectors: dict = None, fields=None):
+        if resource not in CACHED_RESOURCES:
+            yield from self._read(resource, namespace, selectors, fields)
+            return
+        path = self._snapshot_path(resource, namespace, fields, selectors)
+        yield from self._save_snapshot(path, self._refreshed(self._load_snapshot(path), resource, namespace,
+                                                             selectors, fields))
+
+    def list(self, resource: str, namespace: str = None, selectors: dict = None, *, fields=None) -> dict:
+        if resource not in CACHED_RESOURCES and not fields:
+            return self.backend.list(resource, namespace, selectors)
+        return {"items": list(self._iter(resource, namespace, selectors, fields))}
+
+    def iter_items(self, resource: str, namespace: str = None, selectors: dict = None):
+        yield from self._iter(resource, namespace, selectors)
+
+    def iter_projected(self, resource: str, fields, namespace: str = None, selectors: dict = None):
+        yield from self._iter(resource, namespace, selectors, fields)
@@ -0,0 +1,145 @@
+"""Fleet capacity rollups: vCPU, memory and disk per Prism cluster, subnet, image and Kubernetes version.
+
+Every control plane and worker pool becomes one row of a column store built
+from ``array`` columns. Group keys are dictionary encoded, so a rollup is a
+single pass over a few integer and float arrays, whatever the fleet size.
+"""
+
+import re
+from array import array
+from dataclasses import dataclass
+
+GROUPINGS = {
+    "prism_cluster": "Prism Element Cluster",
+    "subnet": "Subnet",
+    "image": "Image",
+    "kubernetes_version": "Kubernetes Version",
+}
+
+# Groupings a pool can have several values of. A pool on two subnets has every node on both, so it is totalled
+# under each of them and these rollups can add up to more than the fleet total
+MULTI_VALUED = {"subnet"}
+
+# Kubernetes quantity suffixes used for memorySize and systemDiskSize
+QUANTITY_SUFFIXES = {
+    "": 1, "k": 10**3, "M": 10**6, "G": 10**9, "T": 10**12, "P": 10**15,
+    "Ki": 2**10, "Mi": 2**20, "Gi": 2**30, "Ti": 2**40, "Pi": 2**50,
+}
+QUANTITY = re.compile(r"^\s*([0-9.]+)\s*([KMGTP]i|[kMGTP])?\s*$")
+
+def parse_gib(quantity) -> float:
+    """Size of a quantity such as ``32Gi`` or ``4096Mi`` in GiB; 0 when missing or malformed."""
+    match = QUANTITY.match(str(quantity or ""))
+    if not match:
+        return 0.0
+    return float(match.group(1)) * QUANTITY_SUFFIXES[match.group(2) or ""] / 2**30
+
+def parse_cpu(quantity) -> float:
+    """Cores in a CPU quantity such as ``4`` or ``3800m``; 0 when missing or malformed."""
+    quantity = str(quantity or "")
+    try:
+        return float(quantity[:-1]) / 1000 if quantity.endswith("m") else float(quantity)
+    except ValueError:
+        return 0.0
+
+@dataclass(slots=True)
+class CapacityTotal:
+    group: str
+    pools: int
+    nodes: int
+    vcpus: float
+    memory_gib: float
+    disk_gib: float
+
+class CapacityTable:
+    def __init__(self):
+        self.nodes = array("q")
+        self.vcpus = array("d")
+        self.memory_gib = array("d")
+        self.disk_gib = array("d")
+        self.codes = {key: array("l") for key in GROUPINGS}
+        self.values = {key: [] for key in GROUPINGS}
+        self._code_of = {key: {} for key in GROUPINGS}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _encode(self, key: str, value) -> int:
+        if key in MULTI_VALUED:
+            value = tuple(sorted({str(item) for item in value or () if item not in (None, "")})) or ("N/A",)
+        else:
+            value = "N/A" if value in (None, "") else str(value)
+        codes = self._code_of[key]
+        if value not in codes:
+            codes[value] = len(self.values[key])
+            self.values[key].append(value)
+        return codes[value]
+
+    @staticmethod
+    def pool_row(machine, nodes: int, kubernetes_version: str) -> list:
+        """One pool of ``nodes`` machines shaped like ``machine`` (a MachineDetails) as a plain row.
+
+        The row holds the nodes, vCPU, memory and disk totals followed by the
+        value of every grouping (a list for those in ``MULTI_VALUED``), so it
+        can be kept as JSON and added later.
+        """
+        return [nodes, nodes * (machine.vcpu_sockets or 0) * (machine.vcpus_per_socket or 0),
+                nodes * parse_gib(machine.memory_size), nodes * parse_gib(machine.system_disk_size),
+                machine.cluster_name, list(machine.subnets), machine.image_name, kubernetes_version]
+
+    @staticmethod
+    def cluster_rows(cluster) -> list:
+        """The rows of the control plane and worker pools of a ClusterRecord, sized by their actual nodes."""
+        return [CapacityTable.pool_row(pool.machine, len(pool.nodes), cluster.kubernetes_version)
+                for pool in [cluster.control_plane, *cluster.worker_pools]]
+
+    def add_row(self, row: list):
+        nodes, vcpus, memory_gib, disk_gib, *values = row
+        self.nodes.append(nodes)
+        self.vcpus.append(vcpus)
+        self.memory_gib.append(memory_gib)
+        self.disk_gib.append(disk_gib)
+        for key, value in zip(GROUPINGS, values):
+            self.codes[key].append(self._encode(key, value))
+
+    def add_cluster(self, cluster):
+        """Add the control plane and worker pools of a ClusterRecord, sized by their actual nodes."""
+        for row in self.cluster_rows(cluster):
+            self.add_row(row)
+
+    def rollup(self, key: str) -> list:
+        """Totals per distinct value of ``key``, largest vCPU total first."""
+        # Plain lists accumulate faster than arrays, which box and unbox on every update
+        groups = len(self.values[key])
+        pools, nodes, vcpus, memory, disk = ([0] * groups for _ in range(5))
+        for code, n, c, m, d in zip(self.codes[key], self.nodes, self.vcpus, self.memory_gib, self.disk_gib):
+            pools[code] += 1
+            nodes[code] += n
+            vcpus[code] += c
+            memory[code] += m
+            disk[code] += d
+
+        totals = {}
+        for code, value in enumerate(self.values[key]):
+            # A multi-valued group key is the combination of a pool's values; it counts towards each of them
+            for group in value if key in MULTI_VALUED else (value,):
+                total = totals.setdefault(group, CapacityTotal(group, 0, 0, 0.0, 0.0, 0.0))
+                total.pools += pools[code]
+                total.nodes += nodes[code]
+                total.vcpus += vcpus[code]
+                total.memory_gib += memory[code]
+                total.disk_gib += disk[code]
+        return sorted(totals.values(), key=lambda total: (-total.vcpus, total.group))
+
+    def fleet_total(self) -> CapacityTotal:
+        return CapacityTotal("Fleet", len(self), sum(self.nodes), sum(self.vcpus),
+                             sum(self.memory_gib), sum(self.disk_gib))
+
+    def rollups(self) -> dict:
+        return {key: self.rollup(key) for key in GROUPINGS}
+
+def build_capacity(clusters) -> CapacityTable:
+    capacity = CapacityTable()
+    for cluster in clusters:
+        capacity.add_cluster(cluster)
+    return capacity
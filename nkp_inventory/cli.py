@@ -0,0 +1,179 @@
+"""Command line options shared by nkp-as-built.py and nkp-as-built-cli.py."""
+
+import argparse
+import sqlite3
+
+from nkp_inventory.bundle import BundleBackend, CapturingBackend
+from nkp_inventory.cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_AGE, CachingBackend
+from nkp_inventory import profiling
+from nkp_inventory.collect import DEFAULT_CONCURRENCY, Scope, collect_inventory
+from nkp_inventory.history import DEFAULT_HISTORY, HistoryStore, Snapshot, describe_scope, snapshot_origin
+from nkp_inventory.kube import BACKENDS, DEFAULT_CHUNK_SIZE, get_backend
+from nkp_inventory.nodes import DEFAULT_NODE_TIMEOUT, collect_nodes
+from nkp_inventory.scheduler import DEFAULT_MAX_RETRIES, DEFAULT_RATE_LIMIT, RequestScheduler
+
+def non_negative(convert):
+    """An argparse ``type`` that converts with ``convert`` and rejects values below zero."""
+    def parse(value: str):
+        number = convert(value)
+        if number < 0:
+            raise argparse.ArgumentTypeError(f"must be 0 or more, not {value}")
+        return number
+    parse.__name__ = convert.__name__
+    return parse
+
+def build_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Maximum number of kubectl calls running at once (default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="auto",
+        help="How to reach the API server: 'api' talks to it directly using KUBECONFIG, "
+             "'kubectl' forks kubectl for every call, 'auto' (default) uses 'api' when "
+             "the kubeconfig allows it and falls back to 'kubectl'"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=non_negative(float),
+        default=DEFAULT_RATE_LIMIT,
+        metavar="QPS",
+        help=f"Maximum kubectl calls or API requests per second, 0 for no limit (default: {DEFAULT_RATE_LIMIT:g})"
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=non_negative(int),
+        default=DEFAULT_MAX_RETRIES,
+        help="Retries of a request that failed with a timeout, server error or 429 "
+             f"(default: {DEFAULT_MAX_RETRIES})"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Objects per page when listing clusters and machines, 0 for no paging (default: {DEFAULT_CHUNK_SIZE})"
+    )
+    parser.add_argument(
+        "--namespace",
+        help="Only inventory the clusters in this namespace"
+    )
+    parser.add_argument(
+        "--cluster",
+        metavar="NAME",
+        help="Only inventory the cluster with this name"
+    )
+    parser.add_argument(
+        "--selector",
+        metavar="LABELS",
+        help="Only inventory the clusters matching this label selector, e.g. 'env=prod,tier!=test'"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directory holding the snapshot of the last run (default: {DEFAULT_CACHE_DIR})"
+    )
+    parser.add_argument(
+        "--cache-max-age",
+        type=int,
+        default=DEFAULT_MAX_AGE,
+        help=f"Ignore snapshots older than this many seconds (default: {DEFAULT_MAX_AGE})"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Read every object from the API server and do not use or update the snapshot"
+    )
+    parser.add_argument(
+        "--history",
+        metavar="DB",
+        default=DEFAULT_HISTORY,
+        help=f"SQLite file every run appends a snapshot of the inventory to (default: {DEFAULT_HISTORY})"
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="Do not record this run in the history"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="TRACE_FILE",
+        help="Time every stage and kubectl/API call and print a summary at the end; "
+             "with TRACE_FILE also write the timings as a Chrome trace"
+    )
+    parser.add_argument(
+        "--nodes",
+        action="store_true",
+        help="Also list the Nodes of every workload cluster, using its kubeconfig Secret on the management cluster"
+    )
+    parser.add_argument(
+        "--node-timeout",
+        type=float,
+        default=DEFAULT_NODE_TIMEOUT,
+        help=f"Give up on a workload cluster's Nodes after this many seconds (default: {DEFAULT_NODE_TIMEOUT})"
+    )
+    bundle = parser.add_mutually_exclusive_group()
+    bundle.add_argument(
+        "--capture",
+        metavar="DIR",
+        help="Save every object read from the cluster into a compressed bundle in DIR"
+    )
+    bundle.add_argument(
+        "--from-bundle",
+        metavar="DIR",
+        help="Generate the report from a bundle saved with --capture, without cluster access"
+    )
+    return parser
+
+def scheduler_from_args(args) -> RequestScheduler:
+    return RequestScheduler(args.rate_limit, args.concurrency, args.max_retries)
+
+def backend_from_args(args, kubeconfig: str = None, context: str = None):
+    if args.from_bundle:
+        return BundleBackend(args.from_bundle)
+
+    backend = get_backend(args.backend, kubeconfig, context, args.chunk_size, scheduler_from_args(args))
+    if not args.no_cache:
+        backend = CachingBackend(backend, args.cache_dir, args.cache_max_age, args.concurrency)
+    # Capture what the collectors see, whether it came from the cache or the cluster
+    if args.capture:
+        backend = CapturingBackend(backend, args.capture)
+    return backend
+
+def collect_from_args(args, backend) -> dict:
+    """Collect the inventory, plus the workload clusters' Nodes when ``--nodes`` is given."""
+    inventory = collect_inventory(backend, args.concurrency, Scope(args.namespace, args.cluster, args.selector))
+    if args.nodes:
+        with profiling.span("node status"):
+            inventory["node_status"] = collect_nodes(backend, inventory["clusters"], args.concurrency,
+                                                     args.node_timeout)
+    return inventory
+
+def snapshot_from_args(args, backend, inventory: dict):
+    """An empty history Snapshot of this run for the report to fill, or None with ``--no-history``."""
+    if args.no_history:
+        return None
+    taken_at, source = snapshot_origin(backend)
+    return Snapshot(taken_at, source, inventory["kommander_cluster_name"], inventory["version"],
+                    describe_scope(Scope(args.namespace, args.cluster, args.selector)))
+
+def save_history(args, snapshot):
+    """Append ``snapshot`` to the history; a history that cannot be written does not fail the run."""
+    if snapshot is None:
+        return
+    try:
+        store = HistoryStore(args.history)
+        try:
+            snapshot_id = store.save(snapshot)
+        finally:
+            store.close()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error saving the history to {args.history}: {e}")
+        return
+    print(f"History: snapshot {snapshot_id} with {len(snapshot.clusters)} clusters saved to {args.history}")
@@ -0,0 +1,348 @@
+"""Collection layer: fetch NKP objects from the management cluster."""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from nkp_inventory import profiling
+from nkp_inventory.kube import KubeError, load_yaml, make_selectors
+
+DEFAULT_CONCURRENCY = 8
+
+# Which clusters a run covers: a namespace, one cluster by name and/or a label
+# selector on the Clusters. Empty fields select everything.
+Scope = namedtuple("Scope", ["namespace", "cluster", "selector"], defaults=(None, None, None))
+
+# Above this many selected clusters their Machines are listed without a selector,
+# so the request URL stays short
+MAX_SELECTED_NAMES = 100
+
+# The only Cluster fields extract_cluster reads; managedFields, annotations
+# (including last-applied-configuration) and status are never downloaded
+CLUSTER_FIELDS = (
+    ("metadata", "name"),
+    ("metadata", "namespace"),
+    ("metadata", "uid"),
+    ("metadata", "resourceVersion"),
+    ("metadata", "labels", "cluster.x-k8s.io/provider"),
+    ("spec", "controlPlaneEndpoint", "host"),
+    ("spec", "controlPlaneRef", "name"),
+    ("spec", "topology", "version"),
+    ("spec", "topology", "variables"),
+    ("spec", "topology", "workers", "machineDeployments"),
+)
+
+def cluster_selectors(scope: Scope) -> dict:
+    return make_selectors(scope.selector, f"metadata.name={scope.cluster}" if scope.cluster else None)
+
+def get_clusters(backend, scope: Scope = Scope()) -> list:
+    try:
+        return list(backend.iter_projected("clusters", CLUSTER_FIELDS, scope.namespace, cluster_selectors(scope)))
+
+    except KubeError as e:
+        print(f"Error listing clusters: {e}")
+        return []
+
+def order_clusters(clusters: list, kommander_cluster_name: str) -> list:
+    # Kommander cluster first, the rest keep the order returned by the API server
+    return sorted(clusters, key=lambda cluster: cluster.get('metadata', {}).get('name') != kommander_cluster_name)
+
+# CAPI labels used to map a Machine back to its cluster and pool
+CLUSTER_NAME_LABEL = "cluster.x-k8s.io/cluster-name"
+DEPLOYMENT_NAME_LABEL = "cluster.x-k8s.io/deployment-name"
+TOPOLOGY_DEPLOYMENT_NAME_LABEL = "topology.cluster.x-k8s.io/deployment-name"
+CONTROL_PLANE_LABEL = "cluster.x-k8s.io/control-plane"
+CONTROL_PLANE_NAME_LABEL = "cluster.x-k8s.io/control-plane-name"
+
+# The Machine fields build_machine_index reads
+MACHINE_FIELDS = (
+    ("metadata", "name"),
+    ("metadata", "namespace"),
+    ("metadata", "uid"),
+    ("metadata", "resourceVersion"),
+    ("metadata", "labels", CLUSTER_NAME_LABEL),
+    ("metadata", "labels", DEPLOYMENT_NAME_LABEL),
+    ("metadata", "labels", TOPOLOGY_DEPLOYMENT_NAME_LABEL),
+    ("metadata", "labels", CONTROL_PLANE_LABEL),
+    ("metadata", "labels", CONTROL_PLANE_NAME_LABEL),
+    ("metadata", "ownerReferences"),
+    ("spec", "clusterName"),
+    ("status", "nodeRef", "name"),
+    ("status", "phase"),
+)
+
+# Machines in any other phase (Pending, Provisioning, Provisioned, Deleting, Failed, Unknown) are listed as unhealthy
+HEALTHY_PHASE = "Running"
+
+# Desired, current, ready, updated and unavailable replicas of a pool's MachineDeployment or KubeadmControlPlane
+REPLICA_FIELDS = (
+    ("spec", "replicas"),
+    ("status", "replicas"),
+    ("status", "readyReplicas"),
+    ("status", "updatedReplicas"),
+    ("status", "unavailableReplicas"),
+)
+
+MACHINE_DEPLOYMENT_FIELDS = (
+    ("metadata", "name"),
+    ("metadata", "namespace"),
+    ("metadata", "uid"),
+    ("metadata", "resourceVersion"),
+    ("metadata", "labels", CLUSTER_NAME_LABEL),
+    ("metadata", "labels", TOPOLOGY_DEPLOYMENT_NAME_LABEL),
+    ("metadata", "ownerReferences"),
+    ("spec", "clusterName"),
+    *REPLICA_FIELDS,
+    ("status", "phase"),
+)
+
+CONTROL_PLANE_FIELDS = (
+    ("metadata", "name"),
+    ("metadata", "namespace"),
+    ("metadata", "uid"),
+    ("metadata", "resourceVersion"),
+    ("metadata", "labels", CLUSTER_NAME_LABEL),
+    ("metadata", "ownerReferences"),
+    *REPLICA_FIELDS,
+)
+
+def get_machine_pool_names(machine: dict) -> set:
+    metadata = machine.get('metadata', {})
+    labels = metadata.get('labels') or {}
+    pool_names = set()
+
+    if CONTROL_PLANE_LABEL in labels:
+        pool_names.add(labels.get(CONTROL_PLANE_NAME_LABEL))
+    for owner in metadata.get('ownerReferences', []):
+        if owner.get('kind') == 'KubeadmControlPlane':
+            pool_names.add(owner.get('name'))
+
+    # Worker pools are known both by their topology name (md-0) and the
+    # generated MachineDeployment name, so index the machine under both
+    pool_names.add(labels.get(DEPLOYMENT_NAME_LABEL))
+    pool_names.add(labels.get(TOPOLOGY_DEPLOYMENT_NAME_LABEL))
+
+    pool_names.discard(None)
+    pool_names.discard('')
+    return pool_names
+
+def build_machine_index(machines, unhealthy: dict = None) -> dict:
+    """Index the node names of ``machines`` as ``{(namespace, cluster, pool): [node names]}``.
+
+    Cluster names are only unique within a namespace, and a Machine always
+    lives in its Cluster's namespace. When ``unhealthy`` is given, every
+    Machine in a phase other than Running is also added to it as
+    ``{(namespace, cluster, pool): ["name (Phase)", ...]}``, including
+    Machines that never got a Node.
+    """
+    machine_index = {}
+
+    for machine in machines:
+        metadata = machine.get('metadata', {})
+        labels = metadata.get('labels') or {}
+        cluster_name = labels.get(CLUSTER_NAME_LABEL) or machine.get('spec', {}).get('clusterName')
+        if not cluster_name:
+            continue
+        status = machine.get('status', {})
+        node_name = (status.get('nodeRef') or {}).get('name')
+        phase = status.get('phase')
+        if not node_name and not (unhealthy is not None and phase and phase != HEALTHY_PHASE):
+            continue
+
+        for pool_name in get_machine_pool_names(machine):
+            key = (metadata.get('namespace'), cluster_name, pool_name)
+            if node_name:
+                machine_index.setdefault(key, []).append(node_name)
+            if unhealthy is not None and phase and phase != HEALTHY_PHASE:
+                unhealthy.setdefault(key, []).append(f"{metadata.get('name')} ({phase})")
+
+    return machine_index
+
+def get_owner_cluster(obj: dict) -> str:
+    """Name of the Cluster owning ``obj``: its Cluster owner reference, else its cluster-name label."""
+    metadata = obj.get('metadata', {})
+    for owner in metadata.get('ownerReferences') or []:
+        if owner.get('kind') == 'Cluster':
+            return owner.get('name')
+    return (metadata.get('labels') or {}).get(CLUSTER_NAME_LABEL) or obj.get('spec', {}).get('clusterName')
+
+def replica_status(obj: dict) -> dict:
+    spec, status = obj.get('spec', {}), obj.get('status', {})
+    # The API server leaves replica counts of zero out of the status
+    return {
+        "desired": spec.get('replicas'),
+        "replicas": status.get('replicas', 0),
+        "ready": status.get('readyReplicas', 0),
+        "updated": status.get('updatedReplicas', 0),
+        "unavailable": status.get('unavailableReplicas', 0),
+        "phase": status.get('phase'),
+    }
+
+def build_replica_index(controllers) -> dict:
+    """Index MachineDeployments or KubeadmControlPlanes by ``(namespace, cluster, pool)``, keeping their replicas.
+
+    A MachineDeployment is found under both its own and its topology name, a
+    KubeadmControlPlane under its name (the Cluster's ``controlPlaneRef``),
+    matching the keys of the machine index.
+    """
+    index = {}
+    for controller in controllers:
+        metadata = controller.get('metadata', {})
+        labels = metadata.get('labels') or {}
+        status, cluster_name = replica_status(controller), get_owner_cluster(controller)
+        for pool_name in {metadata.get('name'), labels.get(TOPOLOGY_DEPLOYMENT_NAME_LABEL)} - {None, ''}:
+            index[(metadata.get('namespace'), cluster_name, pool_name)] = status
+    return index
+
+def build_pool_status(replica_index: dict, unhealthy: dict = None) -> dict:
+    """Join the replica index and the unhealthy Machines into ``{(namespace, cluster, pool): status}``."""
+    unhealthy = unhealthy or {}
+    pool_status = {key: dict(status, unhealthy=unhealthy.get(key, [])) for key, status in replica_index.items()}
+    for key, machines in unhealthy.items():
+        pool_status.setdefault(key, {"unhealthy": machines})
+    return pool_status
+
+def machine_selectors(scope: Scope, cluster_names: list = None) -> dict:
+    """Select the Machines and pool controllers of the clusters in ``scope`` by their cluster-name label.
+
+    They do not carry their Cluster's labels, so a label selected run passes
+    the names of the clusters it found instead.
+    """
+    if scope.cluster:
+        return make_selectors(f"{CLUSTER_NAME_LABEL}={scope.cluster}")
+    if cluster_names is not None and len(cluster_names) <= MAX_SELECTED_NAMES:
+        return make_selectors(f"{CLUSTER_NAME_LABEL} in ({','.join(sorted(set(cluster_names)))})")
+    return {}
+
+def until_failure(items, resource: str, warnings: list = None):
+    """Pass ``items`` through, stopping with a warning when the list fails part way.
+
+    What was read before the failure (e.g. an expired ``continue`` token) is
+    kept; the warning in ``warnings`` says the resource is incomplete.
+    """
+    count = 0
+    try:
+        for item in items:
+            count += 1
+            yield item
+    except KubeError as e:
+        message = f"Listing {resource} stopped after {count} objects, pools may be incomplete: {e}"
+        print(f"Error: {message}")
+        if warnings is not None:
+            warnings.append(message)
+
+def get_machine_index(backend, scope: Scope = Scope(), cluster_names: list = None, unhealthy: dict = None,
+                      warnings: list = None) -> dict:
+    # Machines are indexed page by page as they arrive; only node names and unhealthy Machines are kept
+    machines = backend.iter_projected("machines", MACHINE_FIELDS, scope.namespace,
+                                      machine_selectors(scope, cluster_names))
+    return build_machine_index(until_failure(machines, "machines", warnings), unhealthy)
+
+def get_replica_index(backend, resource: str, fields, scope: Scope = Scope(), cluster_names: list = None,
+                      warnings: list = None) -> dict:
+    """List every MachineDeployment or KubeadmControlPlane in ``scope`` at once, whatever the number of pools."""
+    # Indexed page by page like the Machines; only the replica counts are kept
+    controllers = backend.iter_projected(resource, fields, scope.namespace, machine_selectors(scope, cluster_names))
+    return build_replica_index(until_failure(controllers, resource, warnings))
+
+def get_node_names_by_pool(namespace: str, cluster_name: str, pool_name: str, machine_index: dict) -> list:
+    return machine_index.get((namespace, cluster_name, pool_name), [])
+
+def get_pool_status(namespace: str, cluster_name: str, pool_name: str, pool_status: dict) -> dict:
+    return (pool_status or {}).get((namespace, cluster_name, pool_name))
+
+KOMMANDER_CONFIGMAP = "kommander-bootstrap-configuration"
+
+def parse_kommander_config(configmap: dict) -> tuple:
+    # Parse version and airgapped info
+    kommander_yaml_str = configmap['data'].get('kommander-install.yaml', '')
+    kommander_data = load_yaml(kommander_yaml_str) or {}
+    version = kommander_data.get('version', 'N/A')
+    airgapped = kommander_data.get('airgapped', {}).get('enabled', 'N/A')
+
+    # Extract cluster name from label
+    cluster_name = configmap.get('metadata', {}).get('labels', {}).get('konvoy.d2iq.io/cluster-name', 'N/A')
+
+    return version, airgapped, cluster_name
+
+def get_kommander_config(backend, namespace='default'):
+    try:
+        return parse_kommander_config(backend.get("configmaps", KOMMANDER_CONFIGMAP, namespace))
+
+    except KubeError as e:
+        print(f"Error retrieving Kommander config: {e}")
+        return 'N/A', 'N/A', 'N/A'
+
+def parse_dkp_level(licenses: list):
+    if not licenses:
+        return None
+
+    return licenses[0].get('status', {}).get('dkpLevel')
+
+def get_nkp_dkp_level(backend):
+    try:
+        return parse_dkp_level(backend.list("licenses", namespace="kommander").get('items', []))
+
+    except KubeError as e:
+        print("Error fetching license:", e)
+        return None
+
+def run_concurrently(calls: list, concurrency: int = DEFAULT_CONCURRENCY) -> list:
+    """Run ``(func, args)`` calls on a bounded thread pool.
+
+    Results are returned in the order of ``calls`` regardless of which call
+    finishes first, so callers get deterministic output.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(func, *args) for func, args in calls]
+        return [future.result() for future in futures]
+
+def collect_inventory(backend, concurrency: int = DEFAULT_CONCURRENCY, scope: Scope = Scope()) -> dict:
+    """Fetch everything the reports need, running independent calls in parallel.
+
+    Clusters, Machines, MachineDeployments and KubeadmControlPlanes are
+    filtered by the API server to ``scope``. The last three are listed once
+    each and joined to the pools in memory, however many pools there are.
+    """
+    calls = [
+        (profiling.timed("kommander config", get_kommander_config), (backend,)),
+        (profiling.timed("license", get_nkp_dkp_level), (backend,)),
+        (profiling.timed("cluster list", get_clusters), (backend, scope)),
+    ]
+    # A label selector only matches Clusters; their Machines and pools are selected by name afterwards
+    by_name = bool(scope.selector and not scope.cluster)
+    unhealthy = {}
+    # Every retry, failed request and incomplete list; later stages of the run keep adding to the same list
+    scheduler = getattr(backend, "scheduler", None)
+    warnings = scheduler.events if scheduler else []
+
+    def pool_calls(cluster_names=None):
+        return [
+            (profiling.timed("machine index", get_machine_index), (backend, scope, cluster_names, unhealthy, warnings)),
+            (profiling.timed("machine deployments", get_replica_index),
+             (backend, "machinedeployments", MACHINE_DEPLOYMENT_FIELDS, scope, cluster_names, warnings)),
+            (profiling.timed("control planes", get_replica_index),
+             (backend, "kubeadmcontrolplanes", CONTROL_PLANE_FIELDS, scope, cluster_names, warnings)),
+        ]
+
+    if not by_name:
+        calls += pool_calls()
+    results = run_concurrently(calls, concurrency)
+    (version, airgapped, kommander_cluster_name), dkp_level, clusters = results[:3]
+    if not by_name:
+        machine_index, deployments, control_planes = results[3:]
+    elif clusters:
+        names = [cluster.get('metadata', {}).get('name') for cluster in clusters]
+        machine_index, deployments, control_planes = run_concurrently(pool_calls(names), concurrency)
+    else:
+        machine_index, deployments, control_planes = {}, {}, {}
+
+    return {
+        "version": version,
+        "airgapped": airgapped,
+        "kommander_cluster_name": kommander_cluster_name,
+        "dkp_level": dkp_level,
+        "clusters": order_clusters(clusters, kommander_cluster_name),
+        "machine_index": machine_index,
+        "pool_status": build_pool_status({**deployments, **control_planes}, unhealthy),
+        "warnings": warnings,
+    }
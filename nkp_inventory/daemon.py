@@ -0,0 +1,214 @@
+"""Long-running mode that keeps the inventory live and serves it over HTTP.
+
+The daemon lists clusters, machines, MachineDeployments, KubeadmControlPlanes,
+the Kommander ConfigMap and the license once, then keeps them current from
+watch streams. Reports are rendered from
+memory and the rendered bytes are reused until the next change, so most
+requests are answered without rendering at all.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from nkp_inventory.collect import (
+    DEFAULT_CONCURRENCY, KOMMANDER_CONFIGMAP, build_machine_index, build_pool_status, build_replica_index,
+    order_clusters, parse_dkp_level, parse_kommander_config, run_concurrently,
+)
+from nkp_inventory.report import generate_html_report, generate_json_report
+
+# Resources kept in memory and the namespace they are watched in (None: all)
+WATCHED = {
+    "clusters": None,
+    "machines": None,
+    "machinedeployments": None,
+    "kubeadmcontrolplanes": None,
+    "configmaps": "default",
+    "licenses": "kommander",
+}
+
+RETRY_DELAY = 5
+POLL_INTERVAL = 60
+
+class InventoryStore:
+    """Thread-safe in-memory copy of the watched objects, keyed by UID."""
+
+    renderers = {
+        "html": generate_html_report,
+        "json": generate_json_report,
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._objects = {resource: {} for resource in WATCHED}
+        self._generation = 0
+        self._rendered = {}
+
+    def replace(self, resource: str, items: list):
+        with self._lock:
+            self._objects[resource] = {item["metadata"]["uid"]: item for item in items}
+            self._generation += 1
+
+    def apply(self, resource: str, event_type: str, obj: dict):
+        uid = obj["metadata"]["uid"]
+        with self._lock:
+            if event_type == "DELETED":
+                self._objects[resource].pop(uid, None)
+            else:
+                self._objects[resource][uid] = obj
+            self._generation += 1
+
+    def inventory(self) -> dict:
+        """Build the same inventory dict ``collect_inventory`` returns."""
+        with self._lock:
+            clusters = list(self._objects["clusters"].values())
+            machines = list(self._objects["machines"].values())
+            deployments = list(self._objects["machinedeployments"].values())
+            control_planes = list(self._objects["kubeadmcontrolplanes"].values())
+            licenses = list(self._objects["licenses"].values())
+            configmap = next((obj for obj in self._objects["configmaps"].values()
+                              if obj["metadata"]["name"] == KOMMANDER_CONFIGMAP), None)
+
+        version, airgapped, kommander_cluster_name = (
+            parse_kommander_config(configmap) if configmap else ('N/A', 'N/A', 'N/A'))
+        clusters.sort(key=lambda cluster: (cluster["metadata"]["namespace"], cluster["metadata"]["name"]))
+        unhealthy = {}
+        machine_index = build_machine_index(machines, unhealthy)
+
+        return {
+            "version": version,
+            "airgapped": airgapped,
+            "kommander_cluster_name": kommander_cluster_name,
+            "dkp_level": parse_dkp_level(licenses),
+            "clusters": order_clusters(clusters, kommander_cluster_name),
+            "machine_index": machine_index,
+            "pool_status": build_pool_status(build_replica_index(deployments + control_planes), unhealthy),
+        }
+
+    def render(self, report_format: str) -> bytes:
+        with self._lock:
+            generation = self._generation
+            cached = self._rendered.get(report_format)
+        if cached and cached[0] == generation:
+            return cached[1]
+
+        body = self.renderers[report_format](self.inventory()).encode()
+        with self._lock:
+            self._rendered[report_format] = (generation, body)
+        return body
+
+class Watcher(threading.Thread):
+    """Keep one resource of the store current from a watch stream.
+
+    Backends without watch support (kubectl) are re-listed every
+    ``POLL_INTERVAL`` seconds instead.
+    """
+
+    def __init__(self, backend, store: InventoryStore, resource: str, resource_version: str = None):
+        super().__init__(name=f"watch-{resource}", daemon=True)
+        self.backend = backend
+        self.store = store
+        self.resource = resource
+        self.namespace = WATCHED[resource]
+        self.resource_version = resource_version
+        # Last failure, cleared once the resource is listed or watched again
+        self.error = None
+
+    def relist(self) -> str:
+        result = self.backend.list(self.resource, self.namespace)
+        self.store.replace(self.resource, result.get("items", []))
+        return result.get("metadata", {}).get("resourceVersion")
+
+    def run(self):
+        while True:
+            try:
+                if not hasattr(self.backend, "watch"):
+                    time.sleep(POLL_INTERVAL)
+                    self.relist()
+                    self.error = None
+                    continue
+                if self.resource_version is None:
+                    self.resource_version = self.relist()
+                    self.error = None
+
+                for event_type, obj in self.backend.watch(self.resource, self.namespace, self.resource_version):
+                    if event_type == "ERROR":
+                        # Usually 410 Gone: the resourceVersion is too old, start over from a list
+                        self.resource_version = None
+                        break
+                    self.resource_version = obj["metadata"]["resourceVersion"]
+                    if event_type != "BOOKMARK":
+                        self.store.apply(self.resource, event_type, obj)
+                    self.error = None
+
+            except Exception as e:
+                # Anything escaping here would end the thread and freeze this resource for good
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"Watch on {self.resource} failed, relisting in {RETRY_DELAY}s: {self.error}")
+                self.resource_version = None
+                time.sleep(RETRY_DELAY)
+
+def start_watchers(backend, store: InventoryStore, concurrency: int = DEFAULT_CONCURRENCY) -> list:
+    """List every watched resource once, then start one watcher thread per resource."""
+    watchers = [Watcher(backend, store, resource) for resource in WATCHED]
+    resource_versions = run_concurrently([(watcher.relist, ()) for watcher in watchers], concurrency)
+    for watcher, resource_version in zip(watchers, resource_versions):
+        watcher.resource_version = resource_version
+        watcher.start()
+    return watchers
+
+class ReportHandler(BaseHTTPRequestHandler):
+    routes = {
+        "/": ("html", "text/html; charset=utf-8"),
+        "/report.html": ("html", "text/html; charset=utf-8"),
+        "/report.json": ("json", "application/json"),
+    }
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/healthz":
+            failing = [f"{watcher.resource}: {watcher.error or 'watcher stopped'}"
+                       for watcher in self.server.watchers if watcher.error or not watcher.is_alive()]
+            if failing:
+                self._send(503, "text/plain", "\n".join(failing).encode())
+            else:
+                self._send(200, "text/plain", b"ok")
+        elif path in self.routes:
+            report_format, content_type = self.routes[path]
+            self._send(200, content_type, self.server.store.render(report_format))
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def create_server(backend, address: str, concurrency: int = DEFAULT_CONCURRENCY) -> ThreadingHTTPServer:
+    """List the fleet, start the watchers and bind the report server to ``address`` (``host:port``)."""
+    host, _, port = address.rpartition(":")
+    server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), ReportHandler)
+    server.store = InventoryStore()
+    try:
+        server.watchers = start_watchers(backend, server.store, concurrency)
+    except BaseException:
+        server.server_close()
+        raise
+    return server
+
+def serve(backend, address: str, concurrency: int = DEFAULT_CONCURRENCY):
+    """Serve the live report on ``address`` (``host:port``) until interrupted."""
+    server = create_server(backend, address, concurrency)
+    host, port = server.server_address[:2]
+    print(f"Serving the NKP inventory on http://{host}:{port}/ (report.html, report.json)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,125 @@
+"""Inventory of several management clusters at once.
+
+Every target (a kubeconfig, optionally with a context) is collected and
+rendered in its own worker process, so a slow or broken management cluster
+only costs its own timeout and never takes the others down. Each worker
+writes its report sections to a file; the parent stitches them into one
+document behind an index of all management clusters.
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from multiprocessing.connection import wait
+
+from nkp_inventory.cli import backend_from_args, collect_from_args, save_history, snapshot_from_args
+from nkp_inventory.fragments import FragmentCache
+from nkp_inventory.report import generate_management_heading, generate_management_index, generate_report_sections
+
+DEFAULT_TARGET_TIMEOUT = 600
+READ_SIZE = 1 << 20
+
+Target = namedtuple("Target", ["kubeconfig", "context", "label"])
+TargetResult = namedtuple("TargetResult", ["target", "summary", "fragment", "elapsed"])
+Worker = namedtuple("Worker", ["index", "target", "process", "receiver", "fragment", "started"])
+
+def parse_target(spec: str) -> Target:
+    """Parse ``KUBECONFIG[#CONTEXT]``."""
+    kubeconfig, _, context = spec.partition("#")
+    label = os.path.splitext(os.path.basename(kubeconfig))[0] or kubeconfig
+    if context:
+        label = f"{label}/{context}"
+    return Target(kubeconfig, context or None, label)
+
+def parse_targets(specs: list) -> list:
+    """Parse every spec, numbering repeated labels so each target keeps its own anchor and capture directory."""
+    targets, seen = [], {}
+    for spec in specs:
+        target = parse_target(spec)
+        seen[target.label] = seen.get(target.label, 0) + 1
+        if seen[target.label] > 1:
+            target = target._replace(label=f"{target.label}-{seen[target.label]}")
+        targets.append(target)
+    return targets
+
+def _collect_target(target: Target, args: argparse.Namespace, fragment: str, connection):
+    """Worker process: collect one management cluster and write its report sections to ``fragment``."""
+    try:
+        if args.capture:
+            capture = os.path.join(args.capture, target.label.replace("/", "_"))
+            args = argparse.Namespace(**dict(vars(args), capture=capture))
+        backend = backend_from_args(args, target.kubeconfig, target.context)
+        inventory = collect_from_args(args, backend)
+        fragments = FragmentCache.for_backend(backend) if hasattr(backend, "cache_dir") else None
+        snapshot = snapshot_from_args(args, backend, inventory)
+        with open(fragment, "w") as file:
+            for section in generate_report_sections(inventory, fragments=fragments, history=snapshot):
+                file.write(section)
+        if fragments:
+            fragments.prune()
+        save_history(args, snapshot)
+        connection.send({
+            "kommander_cluster_name": inventory["kommander_cluster_name"],
+            "version": inventory["version"],
+            "dkp_level": inventory["dkp_level"],
+            "clusters": len(inventory["clusters"]),
+        })
+    except Exception as e:
+        connection.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        connection.close()
+
+def collect_targets(targets: list, args: argparse.Namespace, directory: str,
+                    timeout: float = DEFAULT_TARGET_TIMEOUT) -> list:
+    """Collect every target in its own process; results come back in the order of ``targets``.
+
+    A target that fails or is still running after ``timeout`` seconds gets an
+    ``error`` in its summary instead of report sections.
+    """
+    # Spawned workers start clean instead of inheriting this process' threads and state
+    context = multiprocessing.get_context("spawn")
+    pending = {}
+    for index, target in enumerate(targets):
+        receiver, sender = context.Pipe(duplex=False)
+        fragment = os.path.join(directory, f"{index}.html")
+        process = context.Process(target=_collect_target, args=(target, args, fragment, sender),
+                                  name=f"nkp-inventory {target.label}", daemon=True)
+        process.start()
+        sender.close()
+        pending[process.sentinel] = Worker(index, target, process, receiver, fragment, time.monotonic())
+
+    results = [None] * len(targets)
+    while pending:
+        next_deadline = min(worker.started for worker in pending.values()) + timeout
+        finished = wait(list(pending), max(0.0, next_deadline - time.monotonic()))
+        now = time.monotonic()
+        for sentinel, worker in list(pending.items()):
+            if sentinel in finished:
+                worker.process.join()
+                if worker.receiver.poll():
+                    summary = worker.receiver.recv()
+                else:
+                    summary = {"error": f"Worker exited with status {worker.process.exitcode}"}
+            elif now >= worker.started + timeout:
+                worker.process.terminate()
+                worker.process.join()
+                summary = {"error": f"Timed out after {timeout:g}s"}
+            else:
+                continue
+            worker.receiver.close()
+            del pending[sentinel]
+            results[worker.index] = TargetResult(worker.target, summary, worker.fragment, now - worker.started)
+    return results
+
+def generate_combined_sections(results: list):
+    """Yield the index of management clusters followed by each one's report sections."""
+    yield generate_management_index([(f"mc-{index}", result.target.label, result.summary)
+                                     for index, result in enumerate(results)])
+    for index, result in enumerate(results):
+        yield generate_management_heading(f"mc-{index}", result.target.label, result.summary)
+        if "error" in result.summary:
+            continue
+        with open(result.fragment) as file:
+            yield from iter(lambda: file.read(READ_SIZE), "")
@@ -0,0 +1,109 @@
+"""Cache of rendered cluster sections, keyed by a hash of what they are built from.
+
+A cluster's section depends only on its Cluster manifest, the nodes and
+status of its pools and its Node status. When a hash of those matches
+a fragment saved by an earlier run, the section is spliced back in without
+extracting or rendering the cluster again. The manifest is hashed by its
+``uid`` and ``resourceVersion``, which the API server changes on every
+update, so unchanged clusters are not serialised just to be recognised. The
+hash also covers the source of the modules that render the report, so a new
+version never reuses fragments of an old one.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict
+
+from nkp_inventory.cache import DEFAULT_MAX_AGE
+
+# The modules a rendered section depends on, including those that shape the inventory it is rendered from
+RENDER_MODULES = ("capacity.py", "collect.py", "fragments.py", "history.py", "kube.py", "model.py", "report.py")
+
+def _code_version() -> str:
+    digest = hashlib.sha256()
+    for module in RENDER_MODULES:
+        with open(os.path.join(os.path.dirname(__file__), module), "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def by_cluster(pool_index: dict) -> dict:
+    """Regroup an index keyed by ``(namespace, cluster, pool)`` as ``{(namespace, cluster): [pool, value, ...]}``."""
+    # Flat lists: a tuple per pool would be one more object for the garbage collector to scan
+    grouped = {}
+    for (namespace, cluster_name, pool_name), value in pool_index.items():
+        grouped.setdefault((namespace, cluster_name), []).extend((pool_name, value))
+    return grouped
+
+class FragmentCache:
+    def __init__(self, directory: str, max_age: float = DEFAULT_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+        self.stats = {"reused": 0, "rebuilt": 0}
+        self._version = _code_version()
+
+    @classmethod
+    def for_backend(cls, backend) -> "FragmentCache":
+        """A fragment cache next to the snapshots of a CachingBackend, expiring with them."""
+        return cls(os.path.join(backend.cache_dir, "fragments"), backend.max_age)
+
+    def summary(self) -> str:
+        return f"Report sections: {self.stats['reused']} reused, {self.stats['rebuilt']} rebuilt"
+
+    def key(self, cluster_yaml: dict, machines: list, node_status=None, pool_status: list = None) -> str:
+        metadata = cluster_yaml.get("metadata", {})
+        if metadata.get("uid") and metadata.get("resourceVersion"):
+            manifest = [metadata["uid"], metadata["resourceVersion"]]
+        else:
+            manifest = cluster_yaml
+        # Pools are indexed in set order, which changes from one process to the next
+        pools = sorted(zip(machines[::2], machines[1::2]))
+        statuses = sorted(zip(pool_status[::2], pool_status[1::2]), key=lambda item: item[0]) if pool_status else []
+        content = [self._version, manifest, pools, asdict(node_status) if node_status else None, statuses]
+        return hashlib.sha256(json.dumps(content, default=str).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def load(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                fragment = json.loads(file.read())
+            os.utime(path)
+        except (OSError, ValueError):
+            self.stats["rebuilt"] += 1
+            return None
+        self.stats["reused"] += 1
+        return fragment
+
+    def save(self, key: str, fragment: dict):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # One dumps and one write: json.dump would take the slower pure Python encoder. Written to a
+        # temporary file of this writer's own and moved into place, so runs sharing the cache
+        # (``--targets`` workers) never see or leave a half-written fragment
+        data = json.dumps(fragment, separators=(",", ":"))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f"{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def prune(self):
+        """Delete fragments no run has used for ``max_age`` seconds."""
+        cutoff = time.time() - self.max_age
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.unlink(path)
+                except OSError:
+                    pass
@@ -0,0 +1,263 @@
+"""Local history of inventory runs in SQLite.
+
+Every report run appends a snapshot: one row per cluster (Kubernetes
+version and cluster configuration) and one row per control plane and worker
+pool (machine count and machineDetails). Rows are keyed by snapshot, cluster
+and pool, and indexed by cluster and pool for lookups across snapshots, so
+two snapshots are compared with joins on those keys instead of re-reading
+old reports. Configurations are stored once under a digest of their JSON,
+which the rows refer to, since most of them are the same from run to run.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+
+DEFAULT_HISTORY = os.path.join(os.path.expanduser("~"), ".local", "share", "nkp-inventory", "history.sqlite")
+# Several --targets workers may record their snapshots at the same time
+LOCK_TIMEOUT = 60
+# How taken_at is stored: UTC, so that times sort as text
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS configs (
+    digest BLOB PRIMARY KEY,
+    config TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    taken_at TEXT NOT NULL,
+    source TEXT,
+    kommander_cluster_name TEXT,
+    nkp_version TEXT,
+    scope TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_time ON snapshots (taken_at);
+CREATE INDEX IF NOT EXISTS snapshots_by_source ON snapshots (source, taken_at);
+
+CREATE TABLE IF NOT EXISTS clusters (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    namespace TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kubernetes_version TEXT,
+    config BLOB REFERENCES configs (digest),
+    PRIMARY KEY (snapshot_id, namespace, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS clusters_by_name ON clusters (namespace, name, snapshot_id);
+
+CREATE TABLE IF NOT EXISTS pools (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    namespace TEXT NOT NULL,
+    cluster TEXT NOT NULL,
+    role TEXT NOT NULL,
+    pool TEXT NOT NULL,
+    machines INTEGER,
+    config BLOB REFERENCES configs (digest),
+    PRIMARY KEY (snapshot_id, namespace, cluster, role, pool)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pools_by_name ON pools (namespace, cluster, pool, snapshot_id);
+"""
+
+# The ClusterRecord fields compared as the cluster's configuration
+CLUSTER_CONFIG = ("provider", "control_plane_endpoint", "cni_provider", "storage_container", "global_image_registry",
+                  "service_lb_ranges", "image_registries")
+
+def _config(values: dict) -> str:
+    return json.dumps(values, sort_keys=True)
+
+def _digest(config: str) -> bytes:
+    return hashlib.blake2b(config.encode(), digest_size=16).digest()
+
+def history_rows(cluster) -> dict:
+    """The rows a ClusterRecord adds to a snapshot, as plain lists that can be kept as JSON."""
+    namespace = cluster.namespace or ""
+    pools = [["control plane", cluster.control_plane], *(["worker", pool] for pool in cluster.worker_pools)]
+    return {
+        "cluster": [namespace, cluster.name, cluster.kubernetes_version,
+                    _config({key: getattr(cluster, key) for key in CLUSTER_CONFIG})],
+        "pools": [[namespace, cluster.name, role, pool.name or "", len(pool.nodes), _config(asdict(pool.machine))]
+                  for role, pool in pools],
+    }
+
+def snapshot_origin(backend) -> tuple:
+    """``(taken_at, source)`` of the data read through ``backend``; a bundle keeps those of its capture."""
+    manifest = getattr(backend, "manifest", None) or {}
+    taken_at = manifest.get("captured_at") or time.strftime(TIME_FORMAT, time.gmtime())
+    return taken_at, manifest.get("source") or backend.cache_key
+
+def describe_scope(scope) -> str:
+    """``''`` for a run over the whole fleet, else the options it was narrowed with."""
+    return " ".join(f"{key}={value}" for key, value in scope._asdict().items() if value)
+
+class Snapshot:
+    """Rows of one run, written in a single transaction when the run is done."""
+
+    def __init__(self, taken_at: str, source: str, kommander_cluster_name: str, nkp_version: str, scope: str = ""):
+        self.row = (taken_at, source, kommander_cluster_name, nkp_version, scope)
+        self.clusters = []
+        self.pools = []
+
+    def add(self, rows: dict):
+        self.clusters.append(rows["cluster"])
+        self.pools.extend(rows["pools"])
+
+def _time_bound(ref: str) -> str:
+    """``ref`` as a UTC ``taken_at`` to compare with; a bare date covers the whole day."""
+    try:
+        # fromisoformat only accepts a "Z" suffix from Python 3.11 on
+        moment = datetime.fromisoformat(ref[:-1] + "+00:00" if ref.endswith("Z") else ref)
+    except ValueError:
+        raise LookupError(f"Invalid snapshot {ref!r}: expected an ID, latest, latest~N or a date or time "
+                          "such as 2026-09-30 or 2026-09-30T12:00:00Z") from None
+    if len(ref) == 10:
+        moment = moment.replace(hour=23, minute=59, second=59)
+    if moment.tzinfo:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime(TIME_FORMAT)
+
+class HistoryStore:
+    def __init__(self, path: str = DEFAULT_HISTORY):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=LOCK_TIMEOUT)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def save(self, snapshot: Snapshot) -> int:
+        """Append ``snapshot`` and return its id."""
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO snapshots (taken_at, source, kommander_cluster_name, nkp_version, scope) "
+                "VALUES (?, ?, ?, ?, ?)", snapshot.row)
+            snapshot_id = cursor.lastrowid
+            configs = {row[-1] for row in snapshot.clusters} | {row[-1] for row in snapshot.pools}
+            digests = {config: _digest(config) for config in configs}
+            self.connection.executemany("INSERT OR IGNORE INTO configs VALUES (?, ?)",
+                                        [(digest, config) for config, digest in digests.items()])
+            # A pool name repeated within one cluster keeps the row of its last entry
+            self.connection.executemany("INSERT OR REPLACE INTO clusters VALUES (?, ?, ?, ?, ?)",
+                                        [(snapshot_id, *row[:-1], digests[row[-1]]) for row in snapshot.clusters])
+            self.connection.executemany("INSERT OR REPLACE INTO pools VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                        [(snapshot_id, *row[:-1], digests[row[-1]]) for row in snapshot.pools])
+        return snapshot_id
+
+    def snapshots(self, source: str = None, limit: int = None) -> list:
+        """Snapshots with their cluster counts, newest first."""
+        query = ("SELECT s.id, s.taken_at, s.source, s.kommander_cluster_name, s.nkp_version, s.scope, "
+                 "(SELECT COUNT(*) FROM clusters c WHERE c.snapshot_id = s.id) FROM snapshots s")
+        params = []
+        if source:
+            query += " WHERE s.source = ?"
+            params.append(source)
+        query += " ORDER BY s.taken_at DESC, s.id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self.connection.execute(query, params).fetchall()
+
+    def resolve(self, ref: str, source: str = None) -> int:
+        """The snapshot id ``ref`` names: an id, ``latest``, ``latest~N`` or a date or time (UTC).
+
+        A date or time picks the last snapshot taken at or before it. Raises
+        ``LookupError`` when there is no such snapshot.
+        """
+        where, params = ("source = ?", [source]) if source else ("1", [])
+        if ref.isdigit():
+            row = self.connection.execute("SELECT id FROM snapshots WHERE id = ?", (int(ref),)).fetchone()
+        elif ref == "latest" or ref.startswith("latest~"):
+            _, tilde, offset = ref.partition("~")
+            if tilde and not offset.isdigit():
+                raise LookupError(f"Invalid snapshot {ref!r}: expected latest~N with N a number of snapshots")
+            row = self.connection.execute(f"SELECT id FROM snapshots WHERE {where} ORDER BY taken_at DESC, id DESC "
+                                          "LIMIT 1 OFFSET ?", [*params, int(offset or 0)]).fetchone()
+        else:
+            row = self.connection.execute(f"SELECT id FROM snapshots WHERE {where} AND taken_at <= ? "
+                                          "ORDER BY taken_at DESC, id DESC LIMIT 1",
+                                          [*params, _time_bound(ref)]).fetchone()
+        if row is None:
+            raise LookupError(f"No snapshot matches {ref!r}")
+        return row[0]
+
+    def snapshot(self, snapshot_id: int) -> tuple:
+        return self.connection.execute("SELECT id, taken_at, source, kommander_cluster_name, nkp_version, scope "
+                                       "FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+
+    def diff(self, old: int, new: int) -> dict:
+        """What changed from snapshot ``old`` to snapshot ``new``.
+
+        Returns lists of ``clusters_added`` and ``clusters_removed`` as
+        ``(namespace, name, version)``, ``version_changes`` as ``(namespace,
+        name, old, new)``, ``machine_changes`` as ``(namespace, cluster, role,
+        pool, old, new)`` with ``None`` for a pool that was added or removed,
+        and ``config_changes`` as ``(namespace, cluster, pool or None, field,
+        old, new)``. Pools of added and removed clusters are left out.
+        """
+        execute = self.connection.execute
+        added = execute(
+            "SELECT n.namespace, n.name, n.kubernetes_version FROM clusters n "
+            "LEFT JOIN clusters o ON o.snapshot_id = ? AND o.namespace = n.namespace AND o.name = n.name "
+            "WHERE n.snapshot_id = ? AND o.name IS NULL ORDER BY n.namespace, n.name", (old, new)).fetchall()
+        removed = execute(
+            "SELECT o.namespace, o.name, o.kubernetes_version FROM clusters o "
+            "LEFT JOIN clusters n ON n.snapshot_id = ? AND n.namespace = o.namespace AND n.name = o.name "
+            "WHERE o.snapshot_id = ? AND n.name IS NULL ORDER BY o.namespace, o.name", (new, old)).fetchall()
+        changed = execute(
+            "SELECT o.namespace, o.name, o.kubernetes_version, n.kubernetes_version, o.config, n.config "
+            "FROM clusters o JOIN clusters n ON n.snapshot_id = ? AND n.namespace = o.namespace AND n.name = o.name "
+            "WHERE o.snapshot_id = ? "
+            "AND (o.kubernetes_version IS NOT n.kubernetes_version OR o.config IS NOT n.config) "
+            "ORDER BY o.namespace, o.name", (new, old)).fetchall()
+
+        # Pools of clusters present in both snapshots: changed or removed, then added
+        both = ("EXISTS (SELECT 1 FROM clusters c WHERE c.snapshot_id = ? AND c.namespace = {0}.namespace "
+                "AND c.name = {0}.cluster)")
+        pools_old = execute(
+            "SELECT o.namespace, o.cluster, o.role, o.pool, o.machines, n.machines, o.config, n.config FROM pools o "
+            "LEFT JOIN pools n ON n.snapshot_id = ? AND n.namespace = o.namespace AND n.cluster = o.cluster "
+            "AND n.role = o.role AND n.pool = o.pool "
+            f"WHERE o.snapshot_id = ? AND {both.format('o')} "
+            "AND (n.pool IS NULL OR o.machines IS NOT n.machines OR o.config IS NOT n.config)",
+            (new, old, new)).fetchall()
+        pools_new = execute(
+            "SELECT n.namespace, n.cluster, n.role, n.pool, NULL, n.machines, NULL, n.config FROM pools n "
+            "LEFT JOIN pools o ON o.snapshot_id = ? AND o.namespace = n.namespace AND o.cluster = n.cluster "
+            "AND o.role = n.role AND o.pool = n.pool "
+            f"WHERE n.snapshot_id = ? AND {both.format('n')} AND o.pool IS NULL",
+            (old, new, old)).fetchall()
+        pools = sorted(pools_old + pools_new, key=lambda row: row[:4])
+
+        def config(digest) -> dict:
+            row = execute("SELECT config FROM configs WHERE digest = ?", (digest,)).fetchone()
+            return json.loads(row[0]) if row else {}
+
+        # Only configurations whose digests differ are read back and compared field by field
+        config_changes = []
+        for namespace, name, _, _, old_config, new_config in changed:
+            if old_config != new_config:
+                config_changes += [(namespace, name, None, *change)
+                                   for change in _config_changes(config(old_config), config(new_config))]
+        for namespace, cluster, role, pool, _, _, old_config, new_config in pools:
+            if old_config and new_config and old_config != new_config:
+                config_changes += [(namespace, cluster, f"{role} {pool}", *change)
+                                   for change in _config_changes(config(old_config), config(new_config))]
+
+        return {
+            "clusters_added": added,
+            "clusters_removed": removed,
+            "version_changes": [row[:4] for row in changed if row[2] != row[3]],
+            "machine_changes": [row[:6] for row in pools if row[4] != row[5]],
+            "config_changes": config_changes,
+        }
+
+def _config_changes(old: dict, new: dict) -> list:
+    return [(key, old.get(key), new.get(key)) for key in sorted(old.keys() | new.keys())
+            if old.get(key) != new.get(key)]
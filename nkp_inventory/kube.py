@@ -0,0 +1,631 @@
+"""Backends used to read objects from the Kubernetes API server.
+
+Two interchangeable backends are provided:
+
+* ``KubectlBackend`` forks ``kubectl`` for every call, exactly like the
+  scripts always did. It works with any kubeconfig kubectl understands.
+* ``ApiBackend`` talks to the API server directly over a pool of keep-alive
+  HTTP(S) connections, using the credentials from ``KUBECONFIG``. It avoids
+  the kubectl start-up, kubeconfig parsing and TLS handshake on every call.
+
+Both return the decoded JSON objects and raise ``KubeError`` on failure.
+Every kubectl run or API request goes through the backend's
+``RequestScheduler``, which rate limits it and retries transient failures.
+Lists are read in pages of ``chunk_size`` objects using ``limit``/``continue``;
+``iter_items`` yields the objects of a list without holding more than one
+page in memory. Every list call takes optional ``selectors``, a
+``labelSelector``/``fieldSelector`` dict the API server filters on.
+"""
+
+import base64
+import gzip
+import http.client
+import json
+import os
+import queue
+import re
+import ssl
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+from urllib.parse import urlencode, urlsplit
+from urllib.request import getproxies_environment, proxy_bypass_environment
+
+import yaml
+
+from nkp_inventory import profiling
+from nkp_inventory.scheduler import RequestScheduler
+
+# kubectl name and API group/version path for every resource the scripts read
+# ``columns`` maps field paths to the printer columns holding them in a server-side Table
+ResourceType = namedtuple("ResourceType", ["kubectl_name", "api_prefix", "plural", "columns"], defaults=({},))
+
+RESOURCES = {
+    "clusters": ResourceType("clusters.cluster.x-k8s.io", "/apis/cluster.x-k8s.io/v1beta1", "clusters"),
+    "machines": ResourceType("machines.cluster.x-k8s.io", "/apis/cluster.x-k8s.io/v1beta1", "machines", {
+        ("spec", "clusterName"): "Cluster",
+        ("status", "nodeRef", "name"): "NodeName",
+        ("status", "phase"): "Phase",
+    }),
+    "machinedeployments": ResourceType(
+        "machinedeployments.cluster.x-k8s.io", "/apis/cluster.x-k8s.io/v1beta1", "machinedeployments", {
+            ("spec", "clusterName"): "Cluster",
+            ("spec", "replicas"): "Desired",
+            ("status", "replicas"): "Replicas",
+            ("status", "readyReplicas"): "Ready",
+            ("status", "updatedReplicas"): "Updated",
+            ("status", "unavailableReplicas"): "Unavailable",
+            ("status", "phase"): "Phase",
+        }),
+    "kubeadmcontrolplanes": ResourceType(
+        "kubeadmcontrolplanes.controlplane.cluster.x-k8s.io", "/apis/controlplane.cluster.x-k8s.io/v1beta1",
+        "kubeadmcontrolplanes", {
+            ("spec", "replicas"): "Desired",
+            ("status", "replicas"): "Replicas",
+            ("status", "readyReplicas"): "Ready",
+            ("status", "updatedReplicas"): "Updated",
+            ("status", "unavailableReplicas"): "Unavailable",
+        }),
+    "configmaps": ResourceType("configmaps", "/api/v1", "configmaps"),
+    "licenses": ResourceType("licenses.kommander.mesosphere.io", "/apis/kommander.mesosphere.io/v1beta1", "licenses"),
+    "secrets": ResourceType("secrets", "/api/v1", "secrets"),
+    "nodes": ResourceType("nodes", "/api/v1", "nodes"),
+}
+
+# libyaml's C loader is an order of magnitude faster than the pure Python one
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+BACKENDS = ("auto", "api", "kubectl")
+DEFAULT_TIMEOUT = 60
+# Objects per page when listing; 0 asks for the whole collection in one response
+DEFAULT_CHUNK_SIZE = 500
+WATCH_TIMEOUT = 300
+
+# Ask the API server for metadata only (name, namespace, uid, resourceVersion, ...)
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json"
+# A Table of the printer columns plus each object's metadata instead of whole objects
+TABLE_ACCEPT = "application/json;as=Table;g=meta.k8s.io;v=v1,application/json"
+METADATA_COLUMNS = "NAMESPACE:.metadata.namespace,NAME:.metadata.name,UID:.metadata.uid,RV:.metadata.resourceVersion"
+
+def load_yaml(stream):
+    """``yaml.safe_load`` using the libyaml C loader when it is available."""
+    with profiling.span("yaml decode", "parse"):
+        return yaml.load(stream, Loader=YamlLoader)
+
+def _decode_json(text):
+    with profiling.span("json decode", "parse"):
+        return json.loads(text)
+
+def collection_path(resource: str, namespace: str = None) -> str:
+    resource_type = RESOURCES[resource]
+    scope = f"/namespaces/{namespace}" if namespace else ""
+    return f"{resource_type.api_prefix}{scope}/{resource_type.plural}"
+
+def make_selectors(label_selector: str = None, field_selector: str = None) -> dict:
+    """Query parameters for server-side filtering; empty selectors are left out."""
+    selectors = {"labelSelector": label_selector, "fieldSelector": field_selector}
+    return {key: value for key, value in selectors.items() if value}
+
+# Requirements are separated by commas outside the parentheses of a set
+SELECTOR_REQUIREMENT = re.compile(r"(?:[^,(]|\([^)]*\))+")
+SET_REQUIREMENT = re.compile(r"^(\S+)\s+(in|notin)\s*\(([^)]*)\)$")
+
+def _matches_requirement(value_of, requirement: str) -> bool:
+    match = SET_REQUIREMENT.match(requirement)
+    if match:
+        key, operator, values = match.groups()
+        found = value_of(key) in {value.strip() for value in values.split(",")}
+        return found if operator == "in" else not found
+    if requirement.startswith("!"):
+        return value_of(requirement[1:].strip()) is None
+    for operator in ("!=", "==", "="):
+        if operator in requirement:
+            key, value = (part.strip() for part in requirement.split(operator, 1))
+            return value_of(key) != value if operator == "!=" else value_of(key) == value
+    return value_of(requirement) is not None
+
+def matches_selectors(obj: dict, selectors: dict = None) -> bool:
+    """Apply ``selectors`` client-side, for objects that did not come from an API server."""
+    labels = obj.get("metadata", {}).get("labels") or {}
+
+    def field(path: str):
+        value = obj
+        for key in path.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        return None if value is None else str(value)
+
+    for value_of, selector in ((labels.get, (selectors or {}).get("labelSelector")),
+                               (field, (selectors or {}).get("fieldSelector"))):
+        for requirement in SELECTOR_REQUIREMENT.findall(selector or ""):
+            if requirement.strip() and not _matches_requirement(value_of, requirement.strip()):
+                return False
+    return True
+
+def iter_pages(fetch, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, query: dict = None):
+    """Yield the pages of a list, following ``metadata.continue`` until the last one.
+
+    ``fetch`` is called with the request path including ``query`` and the
+    ``limit`` and ``continue`` parameters and returns the decoded page. Only
+    one page is held at a time, so memory use depends on ``chunk_size``
+    rather than on the size of the collection.
+    """
+    token = None
+    while True:
+        params = dict(query or {})
+        if chunk_size:
+            params["limit"] = chunk_size
+        if token:
+            params["continue"] = token
+        page = fetch(f"{path}?{urlencode(params)}" if params else path)
+        yield page
+        token = page.get("metadata", {}).get("continue")
+        if not token:
+            return
+
+def _set_field(obj: dict, path: tuple, value):
+    for key in path[:-1]:
+        obj = obj.setdefault(key, {})
+    obj[path[-1]] = value
+
+def project(obj: dict, fields) -> dict:
+    """Copy only ``fields`` (tuples of keys) of ``obj`` into a new object of the same shape."""
+    projected = {}
+    for path in fields:
+        value = obj
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            _set_field(projected, path, value)
+    return projected
+
+def join_pages(pages) -> dict:
+    """Collect paged results into one list; every page carries the list's resourceVersion."""
+    items, metadata = [], {}
+    for page in pages:
+        items.extend(page.get("items") or [])
+        metadata = page.get("metadata", {})
+    return {"metadata": {"resourceVersion": metadata.get("resourceVersion")}, "items": items}
+
+class KubeError(Exception):
+    """A call to the API server (or kubectl) failed."""
+    # Read by the RequestScheduler to decide whether and when to try again
+    retryable = False
+    throttled = False
+    retry_after = None
+
+class TransientError(KubeError):
+    """A timeout, dropped connection or server error; trying again may succeed."""
+    retryable = True
+
+class ThrottledError(TransientError):
+    """HTTP 429: the API server is shedding load (API Priority and Fairness)."""
+    throttled = True
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# HTTP statuses worth retrying besides 429
+TRANSIENT_STATUSES = {500, 502, 503, 504}
+# kubectl error output for the same conditions
+THROTTLED_MESSAGES = ("TooManyRequests", "too many requests")
+TRANSIENT_MESSAGES = ("i/o timeout", "connection refused", "connection reset", "TLS handshake timeout",
+                      "ServiceUnavailable", "InternalError", "Timeout", "EOF")
+
+def _retry_after(value: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _status_error(message: str, status: int, retry_after: str = None) -> KubeError:
+    if status == 429:
+        return ThrottledError(message, _retry_after(retry_after))
+    if status in TRANSIENT_STATUSES:
+        return TransientError(message)
+    return KubeError(message)
+
+def _kubectl_error(message: str) -> KubeError:
+    if any(text in message for text in THROTTLED_MESSAGES):
+        return ThrottledError(message)
+    if any(text in message for text in TRANSIENT_MESSAGES):
+        return TransientError(message)
+    return KubeError(message)
+
+class KubeconfigNotSupported(KubeError):
+    """The kubeconfig uses a feature only kubectl can handle (e.g. exec plugins)."""
+
+class KubectlBackend:
+    name = "kubectl"
+
+    def __init__(self, kubeconfig: str = None, context: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 scheduler: RequestScheduler = None):
+        self.chunk_size = chunk_size
+        self.scheduler = scheduler or RequestScheduler()
+        self.options = []
+        if kubeconfig:
+            self.options += ["--kubeconfig", kubeconfig]
+        if context:
+            self.options += ["--context", context]
+        self.cache_key = f"{_kubeconfig_path(kubeconfig)}#{context or ''}"
+
+    def _run(self, args: list, output: str = "json") -> str:
+        command = ["kubectl", *self.options, *args]
+        if output:
+            command += ["-o", output]
+        return self.scheduler.call(self._run_once, command)
+
+    def _run_once(self, command: list) -> str:
+        with profiling.span(" ".join(command), "kubectl") as call:
+            try:
+                result = subprocess.run(command, capture_output=True, text=True, check=True)
+            except subprocess.CalledProcessError as e:
+                call.set(status=e.returncode, bytes=len(e.stdout or ""))
+                raise _kubectl_error(f"{e} {e.stderr.strip()}") from e
+            call.set(status=0, bytes=len(result.stdout))
+        return result.stdout
+
+    def get(self, resource: str, name: str, namespace: str) -> dict:
+        return _decode_json(self._run(["get", RESOURCES[resource].kubectl_name, name, "-n", namespace]))
+
+    @staticmethod
+    def _scope(namespace: str = None, selectors: dict = None) -> list:
+        scope = ["-n", namespace] if namespace else ["-A"]
+        if (selectors or {}).get("labelSelector"):
+            scope += ["-l", selectors["labelSelector"]]
+        if (selectors or {}).get("fieldSelector"):
+            scope += ["--field-selector", selectors["fieldSelector"]]
+        return scope
+
+    def list(self, resource: str, namespace: str = None, selectors: dict = None) -> dict:
+        return _decode_json(self._run(["get", RESOURCES[resource].kubectl_name, *self._scope(namespace, selectors),
+                                       f"--chunk-size={self.chunk_size}"]))
+
+    def _raw(self, path: str) -> dict:
+        return _decode_json(self._run(["get", "--raw", path], output=None))
+
+    def iter_items(self, resource: str, namespace: str = None, selectors: dict = None):
+        """Yield the objects of a list one page at a time (one kubectl run per page)."""
+        for page in iter_pages(self._raw, collection_path(resource, namespace), self.chunk_size, selectors):
+            yield from page.get("items") or []
+
+    def iter_projected(self, resource: str, fields, namespace: str = None, selectors: dict = None):
+        # kubectl always downloads whole objects, so they are cut down as each page arrives
+        for item in self.iter_items(resource, namespace, selectors):
+            yield project(item, fields)
+
+    def iter_metadata(self, resource: str, namespace: str = None, selectors: dict = None):
+        """Yield the objects of a list with only ``metadata`` (name, namespace, uid, resourceVersion)."""
+        output = self._run(["get", RESOURCES[resource].kubectl_name, *self._scope(namespace, selectors), "--no-headers",
+                            f"--chunk-size={self.chunk_size}"],
+                           output=f"custom-columns={METADATA_COLUMNS}")
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) == 4:
+                item_namespace, name, uid, resource_version = parts
+                yield {"metadata": {"namespace": item_namespace, "name": name,
+                                    "uid": uid, "resourceVersion": resource_version}}
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive connections to a single API server."""
+
+    def __init__(self, server: str, ssl_context: ssl.SSLContext = None, timeout: float = DEFAULT_TIMEOUT,
+                 deadline: float = None):
+        url = urlsplit(server)
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.base_path = url.path.rstrip("/")
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        # time.monotonic() after which no request is started and none is waited for any longer
+        self.deadline = deadline
+        self._idle = queue.LifoQueue()
+
+    def _request_timeout(self) -> float:
+        if self.deadline is None:
+            return self.timeout
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise KubeError(f"Request to {self.host} not sent: deadline passed")
+        return min(self.timeout, remaining)
+
+    def _new_connection(self, timeout: float = None):
+        timeout = timeout or self.timeout
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=timeout, context=self.ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection()
+
+    def request(self, path: str, headers: dict) -> tuple:
+        # A pooled connection may have been closed by the server while idle,
+        # so a failed request is retried once on a fresh connection
+        for attempt in range(2):
+            timeout = self._request_timeout()
+            connection = self._acquire() if attempt == 0 else self._new_connection(timeout)
+            # A pooled connection keeps the timeout it was opened with
+            connection.timeout = timeout
+            if connection.sock:
+                connection.sock.settimeout(timeout)
+            try:
+                connection.request("GET", self.base_path + path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                if attempt:
+                    raise TransientError(f"Request to {self.host} failed: {e}") from e
+                continue
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._idle.put(connection)
+            if response.getheader("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            return response.status, body, response.getheader("Retry-After")
+
+    def stream(self, path: str, headers: dict, timeout: float):
+        """Yield the lines of a long-running response on a dedicated connection."""
+        connection = self._new_connection(timeout)
+        try:
+            try:
+                connection.request("GET", self.base_path + path, headers=headers)
+                response = connection.getresponse()
+                if response.status != 200:
+                    raise KubeError(f"GET {path} returned {response.status}: {response.read()[:200]!r}")
+                yield from response
+            except (http.client.HTTPException, OSError) as e:
+                raise KubeError(f"Stream from {self.host} failed: {e}") from e
+        finally:
+            connection.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+class ApiBackend:
+    name = "api"
+
+    def __init__(self, kubeconfig: str = None, context: str = None, timeout: float = DEFAULT_TIMEOUT,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, scheduler: RequestScheduler = None, deadline: float = None):
+        server, ssl_context, self.headers, identity = load_kubeconfig(kubeconfig, context)
+        self.chunk_size = chunk_size
+        self.scheduler = scheduler or RequestScheduler()
+        self.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip"})
+        self.pool = ConnectionPool(server, ssl_context, timeout, deadline)
+        # The same server seen through another context or user may show different objects (RBAC)
+        self.cache_key = f"{server}#{identity}"
+
+    def _get(self, path: str, params: dict = None, accept: str = None) -> dict:
+        if params:
+            path += "?" + urlencode(params)
+        headers = dict(self.headers, Accept=accept) if accept else self.headers
+        return _decode_json(self.scheduler.call(self._request, path, headers))
+
+    def _request(self, path: str, headers: dict) -> bytes:
+        with profiling.span(f"GET {path}", "api") as call:
+            status, body, retry_after = self.pool.request(path, headers)
+            call.set(status=status, bytes=len(body))
+        if status != 200:
+            try:
+                message = json.loads(body).get("message", "")
+            except ValueError:
+                message = body[:200].decode(errors="replace")
+            raise _status_error(f"GET {path} returned {status}: {message}", status, retry_after)
+        return body
+
+    def get(self, resource: str, name: str, namespace: str) -> dict:
+        resource_type = RESOURCES[resource]
+        return self._get(f"{resource_type.api_prefix}/namespaces/{namespace}/{resource_type.plural}/{name}")
+
+    def _pages(self, resource: str, namespace: str = None, accept: str = None, query: dict = None,
+               selectors: dict = None):
+        return iter_pages(lambda path: self._get(path, accept=accept),
+                          collection_path(resource, namespace), self.chunk_size, dict(query or {}, **(selectors or {})))
+
+    def iter_items(self, resource: str, namespace: str = None, selectors: dict = None):
+        """Yield the objects of a list one page at a time."""
+        for page in self._pages(resource, namespace, selectors=selectors):
+            yield from page.get("items") or []
+
+    def iter_projected(self, resource: str, fields, namespace: str = None, selectors: dict = None):
+        """Yield the objects of a list with only ``fields`` filled in.
+
+        When every field outside ``metadata`` is a printer column of the
+        resource, the server sends a Table of the columns and each object's
+        metadata instead of whole objects. Otherwise, or when the server's
+        Table lacks a column, whole objects are cut down as they arrive.
+        """
+        columns = RESOURCES[resource].columns
+        if all(path[0] == "metadata" or path in columns for path in fields):
+            pages = self._pages(resource, namespace, TABLE_ACCEPT, {"includeObject": "Metadata"}, selectors)
+            for page in pages:
+                if page.get("kind") != "Table":
+                    yield from (project(item, fields) for item in page.get("items") or [])
+                    continue
+                index = {column["name"]: i for i, column in enumerate(page.get("columnDefinitions") or [])}
+                cells = [(path, index.get(columns[path])) for path in fields if path in columns]
+                if any(i is None for _, i in cells):
+                    # An older CRD without these columns; nothing has been yielded yet
+                    pages.close()
+                    break
+                for row in page.get("rows") or []:
+                    obj = {"metadata": row["object"]["metadata"]}
+                    for path, i in cells:
+                        if row["cells"][i] not in (None, ""):
+                            _set_field(obj, path, row["cells"][i])
+                    yield project(obj, fields)
+            else:
+                return
+
+        for item in self.iter_items(resource, namespace, selectors):
+            yield project(item, fields)
+
+    def list(self, resource: str, namespace: str = None, selectors: dict = None) -> dict:
+        return join_pages(self._pages(resource, namespace, selectors=selectors))
+
+    def iter_metadata(self, resource: str, namespace: str = None, selectors: dict = None):
+        """Yield the objects of a list with only ``metadata``, one page at a time."""
+        for page in self._pages(resource, namespace, METADATA_ACCEPT, selectors=selectors):
+            yield from page.get("items") or []
+
+    def watch(self, resource: str, namespace: str = None, resource_version: str = None,
+              timeout_seconds: int = WATCH_TIMEOUT):
+        """Yield ``(event_type, object)`` pairs until the server ends the watch.
+
+        The server closes the stream after ``timeout_seconds``; callers resume
+        from the last ``resourceVersion`` they saw.
+        """
+        params = {"watch": "1", "allowWatchBookmarks": "true", "timeoutSeconds": timeout_seconds}
+        if resource_version:
+            params["resourceVersion"] = resource_version
+        path = f"{collection_path(resource, namespace)}?{urlencode(params)}"
+        headers = dict(self.headers, **{"Accept-Encoding": "identity"})
+        for line in self.pool.stream(path, headers, timeout_seconds + DEFAULT_TIMEOUT):
+            if line.strip():
+                event = json.loads(line)
+                yield event["type"], event["object"]
+
+def _kubeconfig_path(kubeconfig: str = None) -> str:
+    if kubeconfig:
+        return kubeconfig
+    # Like kubectl, KUBECONFIG may hold a list of files; the first one is used
+    paths = [p for p in os.environ.get("KUBECONFIG", "").split(os.pathsep) if p]
+    return paths[0] if paths else os.path.expanduser("~/.kube/config")
+
+def _named(entries: list, name: str, kind: str) -> dict:
+    for entry in entries or []:
+        if entry.get("name") == name:
+            return entry.get(kind) or {}
+    raise KubeError(f"{kind} '{name}' not found in kubeconfig")
+
+def _data_file(data: str) -> str:
+    fd, path = tempfile.mkstemp(prefix="nkp-inventory-")
+    with os.fdopen(fd, "wb") as file:
+        file.write(base64.b64decode(data))
+    return path
+
+def load_kubeconfig(kubeconfig: str = None, context: str = None) -> tuple:
+    """Return ``(server, ssl_context, headers, identity)`` for a kubeconfig context.
+
+    ``identity`` is ``context/user``, the names the context was resolved to.
+    """
+    path = _kubeconfig_path(kubeconfig)
+    try:
+        with open(path) as file:
+            config = load_yaml(file) or {}
+    except OSError as e:
+        raise KubeconfigNotSupported(f"Cannot read kubeconfig {path}: {e}") from e
+    except yaml.YAMLError as e:
+        raise KubeconfigNotSupported(f"Cannot parse kubeconfig {path}: {e}") from e
+
+    try:
+        return _connection_settings(config, context, os.path.dirname(os.path.abspath(path)))
+    except (KeyError, TypeError, AttributeError, ValueError) as e:
+        # Malformed or unexpected entries (including bad base64 data); kubectl may still make sense of them
+        raise KubeconfigNotSupported(f"Cannot use kubeconfig {path}: {type(e).__name__}: {e}") from e
+
+def _connection_settings(config: dict, context: str, base_dir: str) -> tuple:
+    context_name = context or config.get("current-context")
+    ctx = _named(config.get("contexts"), context_name, "context")
+    cluster = _named(config.get("clusters"), ctx.get("cluster"), "cluster")
+    user = _named(config.get("users"), ctx.get("user"), "user")
+
+    if "exec" in user or "auth-provider" in user:
+        raise KubeconfigNotSupported(f"User '{ctx.get('user')}' uses an exec/auth-provider plugin")
+
+    server = cluster.get("server")
+    if not server:
+        raise KubeconfigNotSupported(f"Cluster '{ctx.get('cluster')}' has no server")
+    url = urlsplit(server)
+    # .port raises ValueError on a malformed port
+    if url.scheme not in ("http", "https") or not url.hostname or url.port == 0:
+        raise KubeconfigNotSupported(f"Cluster '{ctx.get('cluster')}' has an unusable server URL {server!r}")
+    for option in ("proxy-url", "tls-server-name"):
+        if cluster.get(option):
+            raise KubeconfigNotSupported(f"Cluster '{ctx.get('cluster')}' uses {option}")
+    proxies = getproxies_environment()
+    if url.scheme in proxies and not proxy_bypass_environment(url.hostname, proxies):
+        raise KubeconfigNotSupported(f"{url.scheme.upper()}_PROXY is set for {url.hostname}")
+
+    ssl_context = None
+    if server.startswith("https"):
+        ssl_context = ssl.create_default_context()
+        if cluster.get("insecure-skip-tls-verify"):
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+        elif cluster.get("certificate-authority-data"):
+            ca_data = base64.b64decode(cluster["certificate-authority-data"]).decode()
+            ssl_context.load_verify_locations(cadata=ca_data)
+        elif cluster.get("certificate-authority"):
+            ssl_context.load_verify_locations(os.path.join(base_dir, cluster["certificate-authority"]))
+
+        temp_files = []
+        try:
+            cert = user.get("client-certificate")
+            key = user.get("client-key")
+            if user.get("client-certificate-data"):
+                cert = _data_file(user["client-certificate-data"])
+                temp_files.append(cert)
+            if user.get("client-key-data"):
+                key = _data_file(user["client-key-data"])
+                temp_files.append(key)
+            if cert and key:
+                ssl_context.load_cert_chain(os.path.join(base_dir, cert), os.path.join(base_dir, key))
+        finally:
+            for temp_file in temp_files:
+                os.unlink(temp_file)
+
+    headers = {}
+    token = user.get("token")
+    if not token and user.get("tokenFile"):
+        with open(os.path.join(base_dir, user["tokenFile"])) as file:
+            token = file.read().strip()
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    elif user.get("username"):
+        credentials = f"{user['username']}:{user.get('password', '')}".encode()
+        headers["Authorization"] = f"Basic {base64.b64encode(credentials).decode()}"
+
+    return server, ssl_context, headers, f"{context_name}/{ctx.get('user')}"
+
+def backend_from_kubeconfig_data(data: str, timeout: float = DEFAULT_TIMEOUT, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                  scheduler: RequestScheduler = None, deadline: float = None) -> ApiBackend:
+    """Create an ApiBackend from a base64 encoded kubeconfig, as held in a Secret.
+
+    With ``deadline`` (a ``time.monotonic()`` value) no request outlasts it.
+    """
+    path = _data_file(data)
+    try:
+        return ApiBackend(path, timeout=timeout, chunk_size=chunk_size, scheduler=scheduler, deadline=deadline)
+    finally:
+        os.unlink(path)
+
+def get_backend(name: str = "auto", kubeconfig: str = None, context: str = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE, scheduler: RequestScheduler = None):
+    """Create the requested backend.
+
+    ``auto`` uses the API backend when the kubeconfig can be handled natively
+    and falls back to forking kubectl otherwise.
+    """
+    if name == "kubectl":
+        return KubectlBackend(kubeconfig, context, chunk_size, scheduler)
+    try:
+        return ApiBackend(kubeconfig, context, chunk_size=chunk_size, scheduler=scheduler)
+    except (KubeError, ssl.SSLError, OSError) as e:
+        if name == "api":
+            raise
+        print(f"Falling back to kubectl: {e}")
+        return KubectlBackend(kubeconfig, context, chunk_size, scheduler)
@@ -0,0 +1,201 @@
+"""Typed inventory records extracted once from each Cluster manifest.
+
+Both front ends (the HTML report and the terminal output) only format these
+records, so they always show the same data.
+"""
+
+from dataclasses import dataclass, field
+
+from nkp_inventory.capacity import parse_cpu, parse_gib
+from nkp_inventory.collect import get_node_names_by_pool, get_pool_status
+
+@dataclass(slots=True)
+class MachineDetails:
+    """Nutanix machineDetails of the control plane or of a worker pool."""
+    cluster_name: str = None
+    image_name: str = None
+    memory_size: str = None
+    project: str = None
+    subnets: tuple = ()
+    system_disk_size: str = None
+    vcpu_sockets: int = None
+    vcpus_per_socket: int = None
+
+    def fields(self, with_project: bool = True) -> list:
+        """Return ``(label, value)`` pairs in report order, labelled like the manifest.
+
+        The reports show ``project`` for the control plane only, so worker
+        pools pass ``with_project=False``.
+        """
+        return [
+            ("clusterName", self.cluster_name),
+            ("imageName", self.image_name),
+            ("memorySize", self.memory_size),
+            *([("project", self.project)] if with_project else []),
+            ("subnets", ", ".join(self.subnets)),
+            ("systemDiskSize", self.system_disk_size),
+            ("vcpuSockets", self.vcpu_sockets),
+            ("vcpusPerSocket", self.vcpus_per_socket),
+        ]
+
+@dataclass(slots=True)
+class PoolStatus:
+    """Replicas of the KubeadmControlPlane or MachineDeployment behind a pool, and its Machines not Running."""
+    desired: int = None
+    replicas: int = None
+    ready: int = None
+    updated: int = None
+    unavailable: int = None
+    phase: str = None
+    unhealthy: list = field(default_factory=list)
+
+    def summary(self) -> str:
+        if self.replicas is None:
+            return "No MachineDeployment or KubeadmControlPlane found"
+        text = f"{self.ready}/{self.desired if self.desired is not None else 'N/A'} ready, {self.updated} updated"
+        if self.unavailable:
+            text += f", {self.unavailable} unavailable"
+        if self.replicas != self.desired:
+            text += f", {self.replicas} replicas"
+        return f"{text} ({self.phase})" if self.phase else text
+
+@dataclass(slots=True)
+class ControlPlane:
+    name: str
+    machine: MachineDetails
+    nodes: list = field(default_factory=list)
+    # Only set when the pool's replicas or unhealthy Machines were found
+    status: PoolStatus = None
+
+@dataclass(slots=True)
+class WorkerPool:
+    name: str
+    machine: MachineDetails
+    nodes: list = field(default_factory=list)
+    status: PoolStatus = None
+
+@dataclass(slots=True)
+class NodeStatus:
+    """A Node as reported by the workload cluster's own API server."""
+    name: str
+    kubelet_version: str = None
+    cpu: str = None
+    memory: str = None
+    ready: str = "Unknown"
+
+    def summary(self) -> str:
+        return (f"{self.name}: Ready={self.ready}, kubelet {self.kubelet_version or 'N/A'}, "
+                f"{parse_cpu(self.cpu):g} CPU and {parse_gib(self.memory):,.1f} GiB allocatable")
+
+@dataclass(slots=True)
+class ClusterNodes:
+    """The Nodes of one workload cluster, or why they could not be read."""
+    nodes: list = field(default_factory=list)
+    error: str = None
+
+@dataclass(slots=True)
+class ClusterRecord:
+    name: str
+    namespace: str
+    kubernetes_version: str
+    provider: str
+    control_plane_endpoint: str
+    cni_provider: str
+    storage_container: str
+    global_image_registry: str
+    service_lb_ranges: list
+    image_registries: list
+    control_plane: ControlPlane
+    worker_pools: list
+    # Only set when the workload clusters were asked for their Nodes
+    node_status: ClusterNodes = None
+
+def extract_machine_details(machine_details: dict) -> MachineDetails:
+    project = machine_details.get('project')
+    return MachineDetails(
+        cluster_name=machine_details.get('cluster', {}).get('name'),
+        image_name=machine_details.get('image', {}).get('name'),
+        memory_size=machine_details.get('memorySize'),
+        project=project.get('name') if project else None,
+        subnets=tuple(s['name'] for s in machine_details.get('subnets', []) if s.get('name')),
+        system_disk_size=machine_details.get('systemDiskSize'),
+        vcpu_sockets=machine_details.get('vcpuSockets'),
+        vcpus_per_socket=machine_details.get('vcpusPerSocket'),
+    )
+
+def _pool_status(namespace: str, cluster_name: str, pool_name: str, pool_status: dict) -> PoolStatus:
+    status = get_pool_status(namespace, cluster_name, pool_name, pool_status)
+    return PoolStatus(**status) if status else None
+
+def extract_cluster(cluster_yaml: dict, machine_index: dict, node_status: dict = None,
+                    pool_status: dict = None) -> ClusterRecord:
+    """Build the inventory record of one Cluster manifest and its machines.
+
+    ``node_status`` maps ``(namespace, name)`` to the ClusterNodes read from
+    the workload clusters, when they were; ``pool_status`` maps ``(namespace,
+    cluster, pool)`` to the replica counts and unhealthy Machines of each pool.
+    """
+    metadata = cluster_yaml.get('metadata', {})
+    spec = cluster_yaml.get('spec', {})
+    topology = spec.get('topology', {})
+    cluster_name = metadata.get('name')
+    namespace = metadata.get('namespace')
+
+    cni_provider = None
+    service_lb_range = []
+    control_plane_details = {}
+    image_registry_urls = []
+    storage_container = "N/A"
+    global_image_registry = "N/A"
+
+    for var in topology.get('variables', []):
+        if var.get('name') == 'clusterConfig':
+            value = var.get('value', {})
+            addons = value.get('addons', {})
+
+            cni_provider = addons.get('cni', {}).get('provider', 'N/A')
+            service_lb_range = addons.get('serviceLoadBalancer', {}).get('configuration', {}).get('addressRanges', [])
+            control_plane_details = value.get('controlPlane', {}).get('nutanix', {}).get('machineDetails', {})
+            storage_container = addons.get('csi', {}).get('providers', {}).get('nutanix', {}).get(
+                'storageClassConfigs', {}).get('volume', {}).get('parameters', {}).get('storageContainer', 'N/A')
+            global_image_registry = value.get('globalImageRegistryMirror', {}).get('url', 'N/A')
+            image_registry_urls = [reg['url'] for reg in value.get('imageRegistries', []) if reg.get('url')]
+
+    # controlPlaneRef names the KubeadmControlPlane the control plane machines belong to
+    cp_pool_name = spec.get('controlPlaneRef', {}).get('name', '')
+    control_plane = ControlPlane(
+        name=cp_pool_name,
+        machine=extract_machine_details(control_plane_details),
+        nodes=get_node_names_by_pool(namespace, cluster_name, cp_pool_name, machine_index),
+        status=_pool_status(namespace, cluster_name, cp_pool_name, pool_status),
+    )
+
+    worker_pools = []
+    for worker in topology.get('workers', {}).get('machineDeployments', []):
+        worker_name = worker.get('name', 'N/A')
+        for override in worker.get('variables', {}).get('overrides', []):
+            if override.get('name') == 'workerConfig':
+                md = override.get('value', {}).get('nutanix', {}).get('machineDetails', {})
+                worker_pools.append(WorkerPool(
+                    name=worker_name,
+                    machine=extract_machine_details(md),
+                    nodes=get_node_names_by_pool(namespace, cluster_name, worker_name, machine_index),
+                    status=_pool_status(namespace, cluster_name, worker_name, pool_status),
+                ))
+                break
+
+    return ClusterRecord(
+        name=cluster_name,
+        namespace=namespace,
+        kubernetes_version=topology.get('version', 'N/A'),
+        provider=metadata.get('labels', {}).get('cluster.x-k8s.io/provider', 'N/A'),
+        control_plane_endpoint=spec.get('controlPlaneEndpoint', {}).get('host', 'N/A'),
+        cni_provider=cni_provider,
+        storage_container=storage_container,
+        global_image_registry=global_image_registry,
+        service_lb_ranges=[(r.get('start'), r.get('end')) for r in service_lb_range],
+        image_registries=image_registry_urls,
+        control_plane=control_plane,
+        worker_pools=worker_pools,
+        node_status=(node_status or {}).get((metadata.get('namespace'), cluster_name)),
+    )
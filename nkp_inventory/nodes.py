@@ -0,0 +1,119 @@
+"""Node status read from the workload clusters themselves.
+
+The management cluster only knows Machines. For the kubelet version,
+allocatable resources and Ready condition of the real Nodes, every workload
+cluster is reached with the kubeconfig CAPI keeps in its ``<cluster>-kubeconfig``
+Secret. Clusters are read by a bounded number of threads and each one has its
+own deadline, which also bounds every request to it and is not extended by
+retries, so an unreachable cluster is reported as such instead of holding up
+the report or the end of the run.
+"""
+
+import binascii
+import queue
+import ssl
+import threading
+import time
+
+from nkp_inventory import profiling
+from nkp_inventory.collect import DEFAULT_CONCURRENCY
+from nkp_inventory.kube import KubeError, backend_from_kubeconfig_data
+from nkp_inventory.model import ClusterNodes, NodeStatus
+from nkp_inventory.scheduler import RequestScheduler
+
+DEFAULT_NODE_TIMEOUT = 30
+
+# The Node fields the report shows
+NODE_FIELDS = (
+    ("metadata", "name"),
+    ("status", "nodeInfo", "kubeletVersion"),
+    ("status", "allocatable", "cpu"),
+    ("status", "allocatable", "memory"),
+    ("status", "conditions"),
+)
+
+def kubeconfig_secret_name(cluster_name: str) -> str:
+    return f"{cluster_name}-kubeconfig"
+
+def node_status(node: dict) -> NodeStatus:
+    status = node.get("status", {})
+    allocatable = status.get("allocatable", {})
+    ready = next((condition.get("status") for condition in status.get("conditions") or []
+                  if condition.get("type") == "Ready"), "Unknown")
+    return NodeStatus(
+        name=node.get("metadata", {}).get("name"),
+        kubelet_version=status.get("nodeInfo", {}).get("kubeletVersion"),
+        cpu=allocatable.get("cpu"),
+        memory=allocatable.get("memory"),
+        ready=ready,
+    )
+
+def get_cluster_nodes(backend, namespace: str, cluster_name: str,
+                      timeout: float = DEFAULT_NODE_TIMEOUT) -> ClusterNodes:
+    """List the Nodes of one workload cluster, giving up after ``timeout`` seconds."""
+    deadline = time.monotonic() + timeout
+    workload = None
+    try:
+        with profiling.span("cluster nodes", cluster=cluster_name):
+            secret = backend.get("secrets", kubeconfig_secret_name(cluster_name), namespace)
+            data = (secret.get("data") or {}).get("value")
+            if not data:
+                raise KubeError(f"Secret {kubeconfig_secret_name(cluster_name)} holds no kubeconfig")
+            # No retries, and every request is cut off at the deadline rather than only the whole listing
+            workload = backend_from_kubeconfig_data(data, timeout, backend.chunk_size,
+                                                    RequestScheduler(rate_limit=0, max_retries=0, quiet=True), deadline)
+            nodes = []
+            for node in workload.iter_projected("nodes", NODE_FIELDS):
+                nodes.append(node_status(node))
+                if time.monotonic() > deadline:
+                    raise KubeError(f"Timed out after {timeout:g}s")
+            return ClusterNodes(sorted(nodes, key=lambda node: node.name or ""))
+
+    except (KubeError, ssl.SSLError, OSError, binascii.Error) as e:
+        return ClusterNodes(error=str(e))
+    finally:
+        if workload:
+            workload.pool.close()
+
+def collect_nodes(backend, clusters: list, concurrency: int = DEFAULT_CONCURRENCY,
+                  timeout: float = DEFAULT_NODE_TIMEOUT) -> dict:
+    """Read the Nodes of every cluster in ``clusters`` (Cluster manifests).
+
+    Returns ``{(namespace, name): ClusterNodes}``. At most ``concurrency``
+    clusters are read at once; a cluster still running ``timeout`` seconds
+    after it started is reported as timed out. Its thread is a daemon and its
+    requests end at the same deadline, so it does not keep the process alive.
+    """
+    keys = [(cluster["metadata"].get("namespace"), cluster["metadata"]["name"]) for cluster in clusters]
+    todo, finished = queue.SimpleQueue(), queue.SimpleQueue()
+    for key in keys:
+        todo.put(key)
+    started = {}
+
+    def read():
+        while True:
+            try:
+                key = todo.get_nowait()
+            except queue.Empty:
+                return
+            started[key] = time.monotonic()
+            finished.put((key, get_cluster_nodes(backend, *key, timeout)))
+
+    for index in range(min(max(1, concurrency), len(keys))):
+        threading.Thread(target=read, name=f"nodes_{index}", daemon=True).start()
+
+    results = {}
+    while len(results) < len(keys):
+        running = [(key, start) for key, start in list(started.items()) if key not in results]
+        next_deadline = min((start + timeout for _, start in running), default=time.monotonic() + timeout)
+        try:
+            key, nodes = finished.get(timeout=max(0.0, next_deadline - time.monotonic()))
+            results.setdefault(key, nodes)
+        except queue.Empty:
+            pass
+        now = time.monotonic()
+        for key, start in running:
+            if key not in results and now >= start + timeout:
+                results[key] = ClusterNodes(error=f"Timed out after {timeout:g}s")
+
+    return {key: results[key] for key in keys}
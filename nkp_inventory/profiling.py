@@ -0,0 +1,149 @@
+"""Optional instrumentation enabled with ``--profile``.
+
+Stages (Kommander config, license, cluster list, every cluster's extraction
+and render, ...) and external calls (kubectl runs and API requests) are
+recorded as timed spans. At the end of the run ``Profiler.report`` prints a
+summary table and can write every span as a Chrome trace, which opens in
+chrome://tracing or https://ui.perfetto.dev.
+
+Profiling is off unless ``enable`` is called: ``span`` then returns a shared
+no-op context manager and ``timed`` returns the function unchanged, so the
+instrumented code pays one global lookup per call.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+Span = namedtuple("Span", ["name", "category", "start", "duration", "thread", "args"])
+
+# Categories of spans that are calls to something outside this process
+EXTERNAL = ("kubectl", "api")
+SLOWEST_CALLS = 10
+
+_profiler = None
+
+class _Recorder:
+    __slots__ = ("profiler", "name", "category", "args", "start")
+
+    def __init__(self, profiler, name: str, category: str, args: dict):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter() - self.start
+        if exc_type and "error" not in self.args:
+            self.args["error"] = exc_type.__name__
+        self.profiler.add(self.name, self.category, self.start, duration, self.args)
+        return False
+
+    def set(self, **args):
+        """Attach results known only at the end of the span (bytes, exit status, ...)."""
+        self.args.update(args)
+
+class _Disabled:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def set(self, **args):
+        pass
+
+_DISABLED = _Disabled()
+
+class Profiler:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.thread_names = {}
+
+    def add(self, name: str, category: str, start: float, duration: float, args: dict):
+        thread = threading.current_thread()
+        self.thread_names[thread.ident] = thread.name
+        # list.append is atomic, so worker threads can record without a lock
+        self.spans.append(Span(name, category, start - self.origin, duration, thread.ident, args))
+
+    def summary(self) -> str:
+        stages, calls = {}, {}
+        for span in self.spans:
+            if span.category in EXTERNAL:
+                count, total, size, errors = calls.get(span.category, (0, 0.0, 0, 0))
+                failed = span.args.get("status") not in (0, 200)
+                calls[span.category] = (count + 1, total + span.duration, size + span.args.get("bytes", 0),
+                                        errors + failed)
+            else:
+                count, total, longest = stages.get(span.name, (0, 0.0, 0.0))
+                stages[span.name] = (count + 1, total + span.duration, max(longest, span.duration))
+
+        lines = [f"\nProfile ({time.perf_counter() - self.origin:.3f}s wall)",
+                 f"{'Stage':<24} {'count':>7} {'total (s)':>10} {'mean (ms)':>10} {'max (ms)':>10}"]
+        for name, (count, total, longest) in stages.items():
+            lines.append(f"{name:<24} {count:>7} {total:>10.3f} {total / count * 1000:>10.2f} {longest * 1000:>10.2f}")
+
+        lines.append(f"\n{'External calls':<24} {'count':>7} {'total (s)':>10} {'bytes':>12} {'failed':>7}")
+        for category, (count, total, size, errors) in calls.items():
+            lines.append(f"{category:<24} {count:>7} {total:>10.3f} {size:>12} {errors:>7}")
+
+        slowest = sorted((span for span in self.spans if span.category in EXTERNAL),
+                         key=lambda span: span.duration, reverse=True)[:SLOWEST_CALLS]
+        if slowest:
+            lines.append("\nSlowest calls:")
+        for span in slowest:
+            lines.append(f"  {span.duration:8.3f}s {span.args.get('bytes', 0):>12} B  "
+                         f"status {span.args.get('status', '-')!s:<4} {span.args.get('command', span.name)}")
+        return "\n".join(lines)
+
+    def write_trace(self, filename: str):
+        """Write every span in the Chrome trace event format."""
+        pid = os.getpid()
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": name}}
+                  for ident, name in self.thread_names.items()]
+        events.extend({
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": round(span.start * 1e6, 1),
+            "dur": round(span.duration * 1e6, 1),
+            "pid": pid,
+            "tid": span.thread,
+            "args": span.args,
+        } for span in self.spans)
+        with open(filename, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=str)
+
+    def report(self, trace_file: str = None):
+        print(self.summary())
+        if trace_file:
+            self.write_trace(trace_file)
+            print(f"Trace written to {trace_file}")
+
+def enable() -> Profiler:
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+def span(name: str, category: str = "stage", **args):
+    """Context manager timing the enclosed block as one span."""
+    if _profiler is None:
+        return _DISABLED
+    return _Recorder(_profiler, name, category, args)
+
+def timed(name: str, func):
+    """Return ``func`` wrapped in a span named ``name`` when profiling is on."""
+    if _profiler is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return func(*args, **kwargs)
+    return wrapper
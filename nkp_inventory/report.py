@@ -0,0 +1,311 @@
+"""HTML rendering of the inventory records.
+
+The report is streamed: every section is written to the output file as soon
+as it is rendered, so memory use does not grow with the size of the fleet.
+For very large fleets the report can instead be split into a light index page
+and one page per cluster, which the browser only loads when it is opened.
+"""
+
+import json
+import os
+import shutil
+from dataclasses import asdict
+from html import escape
+
+from nkp_inventory import profiling
+from nkp_inventory.capacity import GROUPINGS, CapacityTable, build_capacity
+from nkp_inventory.fragments import by_cluster
+from nkp_inventory.history import history_rows
+from nkp_inventory.model import extract_cluster
+
+DOCUMENT_START = "<html><head><title>NKP Basic Inventory</title></head><body><h1>NKP Basic Inventory</h1>"
+DOCUMENT_END = "</body></html>"
+
+# Hides the rows of the cluster list that do not contain the search text
+SEARCH_SCRIPT = (
+    "<script>function filterClusters(text) { text = text.toLowerCase();"
+    " for (const row of document.querySelectorAll('tr[data-search]'))"
+    " row.style.display = row.dataset.search.includes(text) ? '' : 'none'; }</script>"
+)
+
+def _row(header: str, value) -> str:
+    return f"<tr><th>{escape(header)}</th><td>{escape(str(value))}</td></tr>"
+
+def _lines(lines) -> str:
+    return "".join(f"{escape(str(line))}<br>" for line in lines)
+
+def _fields(fields) -> str:
+    return "".join(f"<b>{escape(key)}</b>: {escape(str(val))}<br>" for key, val in fields)
+
+def generate_kommander_table(kommander_cluster_name, version, airgapped) -> str:
+    return "".join([
+        "<h2>Kommander Cluster Details</h2><table border='1'>",
+        _row("Kommander Cluster Name", kommander_cluster_name),
+        _row("NKP Version", version),
+        _row("Airgapped", airgapped),
+        "</table><br>",
+    ])
+
+def generate_warnings_table(warnings: list) -> str:
+    """Retried and failed API requests; data behind a failed request is missing from the report."""
+    return "".join([
+        "<h2>Collection Warnings</h2><p>Some requests to the API server had to be retried or failed. "
+        "Data behind a failed request is missing from this report.</p>",
+        _lines(warnings),
+        "<br>",
+    ])
+
+def generate_html_table(cluster) -> str:
+    parts = [
+        f"<h2>Cluster: {escape(str(cluster.name))}</h2><table border='1'>",
+        _row("Kubernetes Version", cluster.kubernetes_version),
+        _row("Cluster Provider", cluster.provider),
+        _row("Control Plane Endpoint", cluster.control_plane_endpoint),
+        _row("CNI Provider", cluster.cni_provider),
+        _row("Storage Container", cluster.storage_container),
+        _row("Global Image Registry", cluster.global_image_registry),
+        "<tr><th>Service LoadBalancer Address Range</th><td>",
+        _lines(f"Start: {start}, End: {end}" for start, end in cluster.service_lb_ranges),
+        "</td></tr><tr><th>Image Registries</th><td>",
+        _lines(f"- {url}" for url in cluster.image_registries),
+        "</td></tr><tr><th>Controlplane Configuration</th><td>",
+        _fields(cluster.control_plane.machine.fields()),
+        "</td></tr><tr><th>Worker Configuration</th><td>",
+    ]
+    for pool in cluster.worker_pools:
+        parts.append(f"<b>Worker Name:</b> {escape(str(pool.name))}<br>")
+        parts.append(_fields(pool.machine.fields(with_project=False)))
+
+    # Controlplane and Worker nodes
+    parts.append("</td></tr><tr><th>Controlplane Nodes</th><td>")
+    parts.append(_lines(f"- {node}" for node in cluster.control_plane.nodes))
+    parts.append("</td></tr><tr><th>Worker Nodes</th><td>")
+    for pool in cluster.worker_pools:
+        parts.append(f"<b>Worker Pool:</b> {escape(str(pool.name))}<br>")
+        parts.append(_lines(f"- {node}" for node in pool.nodes))
+    pools = [("Controlplane", cluster.control_plane),
+             *((f"Worker Pool {pool.name}", pool) for pool in cluster.worker_pools)]
+    if any(pool.status for _, pool in pools):
+        parts.append("</td></tr><tr><th>Pool Status</th><td>")
+        for label, pool in pools:
+            if pool.status:
+                parts.append(f"<b>{escape(label)}:</b> {escape(pool.status.summary())}<br>")
+                parts.append(_lines(f"- {machine}" for machine in pool.status.unhealthy))
+    if cluster.node_status:
+        parts.append("</td></tr><tr><th>Node Status</th><td>")
+        if cluster.node_status.error:
+            parts.append(_lines([f"Unavailable: {cluster.node_status.error}"]))
+        parts.append(_lines(f"- {node.summary()}" for node in cluster.node_status.nodes))
+    parts.append("</td></tr></table><br>")
+
+    return "".join(parts)
+
+def _capacity_row(total) -> str:
+    cells = [total.group, total.pools, total.nodes, f"{total.vcpus:g}", f"{total.memory_gib:,.1f}",
+             f"{total.disk_gib:,.1f}"]
+    return "<tr>" + "".join(f"<td>{escape(str(cell))}</td>" for cell in cells) + "</tr>"
+
+def generate_capacity_table(capacity: CapacityTable) -> str:
+    parts = ["<h2>Capacity Summary</h2>"]
+    for key, label in GROUPINGS.items():
+        parts.append(f"<h3>By {escape(label)}</h3><table border='1'><tr><th>{escape(label)}</th><th>Pools</th>"
+                     "<th>Nodes</th><th>vCPUs</th><th>Memory (GiB)</th><th>System Disk (GiB)</th></tr>")
+        parts.extend(_capacity_row(total) for total in capacity.rollup(key))
+        parts.append(_capacity_row(capacity.fleet_total()))
+        parts.append("</table><br>")
+    return "".join(parts)
+
+def generate_management_index(management_clusters: list) -> str:
+    """Index of a combined report; ``management_clusters`` holds ``(anchor, label, summary)`` tuples."""
+    parts = ["<h2>Management Clusters</h2><table border='1'><tr><th>Target</th><th>Kommander Cluster Name</th>"
+             "<th>NKP Version</th><th>Licence Tier</th><th>Clusters</th><th>Status</th></tr>"]
+    for anchor, label, summary in management_clusters:
+        cells = [summary.get(key, "") for key in ("kommander_cluster_name", "version", "dkp_level", "clusters")]
+        parts.append(f"<tr><td><a href='#{escape(anchor)}'>{escape(label)}</a></td>"
+                     + "".join(f"<td>{escape(str(cell))}</td>" for cell in cells)
+                     + f"<td>{escape(summary.get('error', 'OK'))}</td></tr>")
+    parts.append("</table><br>")
+    return "".join(parts)
+
+def generate_management_heading(anchor: str, label: str, summary: dict) -> str:
+    heading = f"<h1 id='{escape(anchor)}'>Management Cluster: {escape(label)}</h1>"
+    if "error" in summary:
+        heading += f"<p>Collection failed: {escape(summary['error'])}</p>"
+    return heading
+
+def _summary_sections(inventory: dict) -> str:
+    sections = generate_kommander_table(inventory["kommander_cluster_name"], inventory["version"],
+                                        inventory["airgapped"])
+    if inventory.get("warnings"):
+        sections += generate_warnings_table(inventory["warnings"])
+    return sections
+
+def render_cluster_fragment(cluster) -> dict:
+    """Everything the reports keep of one cluster: its tables, split index row, capacity rows and history rows."""
+    page = cluster_page_name(cluster)
+    return {
+        "name": cluster.name,
+        "table": generate_html_table(cluster),
+        "page": page,
+        "index_row": generate_index_row(cluster, page),
+        "capacity": CapacityTable.cluster_rows(cluster),
+        "history": history_rows(cluster),
+    }
+
+def _cluster_fragments(inventory: dict, capacity: CapacityTable, on_cluster=None, fragments=None, history=None):
+    """Yield the fragment of every cluster, Kommander cluster first, adding each to ``capacity``.
+
+    Each cluster's rows are also added to ``history`` (a history Snapshot) when it is given.
+
+    With a FragmentCache as ``fragments``, a cluster whose manifest, machines
+    and Node status are unchanged since an earlier run is taken from the
+    cache instead of being extracted and rendered again.
+    """
+    machines = by_cluster(inventory["machine_index"]) if fragments else {}
+    pool_status = by_cluster(inventory.get("pool_status") or {}) if fragments else {}
+    node_status = inventory.get("node_status") or {}
+    for cluster_yaml in inventory["clusters"]:
+        if on_cluster:
+            on_cluster(cluster_yaml)
+        metadata = cluster_yaml.get("metadata", {})
+        name = metadata.get("name")
+        cluster_key = (metadata.get("namespace"), name)
+        key = fragment = None
+        if fragments:
+            key = fragments.key(cluster_yaml, machines.get(cluster_key, []), node_status.get(cluster_key),
+                                pool_status.get(cluster_key))
+            fragment = fragments.load(key)
+        if fragment is None:
+            with profiling.span("extract cluster", cluster=name):
+                cluster = extract_cluster(cluster_yaml, inventory["machine_index"], inventory.get("node_status"),
+                                          inventory.get("pool_status"))
+            with profiling.span("render cluster", cluster=name):
+                fragment = render_cluster_fragment(cluster)
+            if fragments:
+                fragments.save(key, fragment)
+        for row in fragment["capacity"]:
+            capacity.add_row(row)
+        if history:
+            history.add(fragment["history"])
+        yield fragment
+
+def generate_report_sections(inventory: dict, on_cluster=None, fragments=None, history=None):
+    """Yield the report sections, extracting and rendering one cluster at a time.
+
+    ``on_cluster`` is called with each Cluster manifest before it is rendered;
+    unchanged clusters are reused from ``fragments`` and every cluster is
+    added to the ``history`` snapshot when they are given. The capacity
+    summary comes last, totalled from the records as they pass.
+    """
+    yield _summary_sections(inventory)
+
+    capacity = CapacityTable()
+    for fragment in _cluster_fragments(inventory, capacity, on_cluster, fragments, history):
+        yield fragment["table"]
+
+    with profiling.span("capacity summary"):
+        section = generate_capacity_table(capacity)
+    yield section
+
+def cluster_page_name(cluster) -> str:
+    return f"clusters/{cluster.namespace}--{cluster.name}.html"
+
+def _cluster_page(name, table: str) -> str:
+    return "".join([
+        f"<html><head><title>NKP Inventory: {escape(str(name))}</title></head><body>",
+        "<p><a href='../index.html'>All clusters</a></p>",
+        table,
+        DOCUMENT_END,
+    ])
+
+def generate_index_row(cluster, page: str) -> str:
+    nodes = len(cluster.control_plane.nodes) + sum(len(pool.nodes) for pool in cluster.worker_pools)
+    cells = [cluster.namespace, cluster.kubernetes_version, cluster.provider, cluster.control_plane_endpoint,
+             len(cluster.worker_pools), nodes]
+    search = " ".join(str(value) for value in [cluster.name, *cells[:4]]).lower()
+    return (f"<tr data-search='{escape(search)}'><td><a href='{escape(page)}'>{escape(str(cluster.name))}</a></td>"
+            + "".join(f"<td>{escape(str(cell))}</td>" for cell in cells) + "</tr>")
+
+def generate_cluster_index(rows: list) -> str:
+    return "".join([
+        f"<h2>Clusters ({len(rows)})</h2>",
+        "<p><input type='search' placeholder='Filter by name, namespace, version, provider or endpoint' size='60' "
+        "oninput='filterClusters(this.value)'></p>",
+        SEARCH_SCRIPT,
+        "<table border='1'><tr><th>Cluster</th><th>Namespace</th><th>Kubernetes Version</th><th>Cluster Provider</th>"
+        "<th>Control Plane Endpoint</th><th>Worker Pools</th><th>Nodes</th></tr>",
+        *rows,
+        "</table><br>",
+    ])
+
+def save_split_output(inventory: dict, directory: str, on_cluster=None, fragments=None, history=None):
+    """Write the report as ``directory/index.html`` plus one page per cluster under ``directory/clusters``.
+
+    The index holds the summary, a searchable list of the clusters and the
+    capacity summary; a cluster's tables are only loaded when its page is
+    opened. Every page is written as soon as its cluster is rendered. The
+    report is built next to ``directory`` and swapped in at the end, so pages
+    of clusters that no longer exist do not linger.
+    """
+    # "out/" (as tab completion writes it) must not turn the siblings into "out/.tmp" inside the report
+    directory = os.path.normpath(directory)
+    parent, name = os.path.split(directory)
+    temp_directory = os.path.join(parent, f"{name}.tmp")
+    shutil.rmtree(temp_directory, ignore_errors=True)
+    os.makedirs(os.path.join(temp_directory, "clusters"))
+
+    rows = []
+    capacity = CapacityTable()
+    for fragment in _cluster_fragments(inventory, capacity, on_cluster, fragments, history):
+        with open(os.path.join(temp_directory, fragment["page"]), "w") as file:
+            file.write(_cluster_page(fragment["name"], fragment["table"]))
+        rows.append(fragment["index_row"])
+
+    with profiling.span("capacity summary"):
+        index = [_summary_sections(inventory), generate_cluster_index(rows), generate_capacity_table(capacity)]
+    with open(os.path.join(temp_directory, "index.html"), "w") as file:
+        file.write(DOCUMENT_START + "".join(index) + DOCUMENT_END)
+
+    old_directory = os.path.join(parent, f"{name}.old")
+    if os.path.exists(directory):
+        shutil.rmtree(old_directory, ignore_errors=True)
+        os.rename(directory, old_directory)
+    os.rename(temp_directory, directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+
+def generate_html_report(inventory: dict) -> str:
+    return DOCUMENT_START + "".join(generate_report_sections(inventory)) + DOCUMENT_END
+
+def generate_json_report(inventory: dict) -> str:
+    clusters = [extract_cluster(cluster_yaml, inventory["machine_index"], inventory.get("node_status"),
+                                inventory.get("pool_status"))
+                for cluster_yaml in inventory["clusters"]]
+    capacity = build_capacity(clusters)
+    return json.dumps({
+        "kommander_cluster_name": inventory["kommander_cluster_name"],
+        "nkp_version": inventory["version"],
+        "airgapped": inventory["airgapped"],
+        "licence_tier": inventory["dkp_level"],
+        "warnings": list(inventory.get("warnings", [])),
+        "clusters": [asdict(cluster) for cluster in clusters],
+        "capacity": {
+            "fleet": asdict(capacity.fleet_total()),
+            **{key: [asdict(total) for total in totals] for key, totals in capacity.rollups().items()},
+        },
+    }, indent=2)
+
+def save_html_output(sections, filename="cluster_details.html"):
+    """Stream the report ``sections`` into ``filename`` inside one HTML document.
+
+    ``sections`` may be a generator, in which case each section is rendered
+    only when it is written. The file is written next to its final name and
+    moved into place at the end, so an interrupted run never leaves a
+    truncated report behind.
+    """
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, "w") as file:
+        file.write(DOCUMENT_START)
+        for section in sections:
+            file.write(section)
+        file.write(DOCUMENT_END)
+    os.replace(temp_filename, filename)
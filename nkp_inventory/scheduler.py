@@ -0,0 +1,122 @@
+"""Rate limiting, retries and adaptive concurrency for API server requests.
+
+Every kubectl run or API request of a backend goes through its
+``RequestScheduler``:
+
+* a token bucket caps the request rate,
+* failures that may go away (timeouts, dropped connections, 5xx, 429) are
+  retried with jittered exponential backoff, honouring ``Retry-After``,
+* the number of requests in flight adapts to the server: it is halved on
+  every 429 from API Priority and Fairness and grows back by about one per
+  round of successful requests.
+
+Every retry and every request given up on is printed and kept, so the
+reports can say which data may be missing.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+
+# The same defaults as kubectl: 50 requests per second with bursts of up to 300
+DEFAULT_RATE_LIMIT = 50.0
+BURST_FACTOR = 6
+DEFAULT_MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+# Retries and failures kept for the report; a long-running daemon keeps only the latest
+MAX_EVENTS = 1000
+
+class RequestScheduler:
+    def __init__(self, rate_limit: float = DEFAULT_RATE_LIMIT, max_concurrency: int = 8,
+                 max_retries: int = DEFAULT_MAX_RETRIES, quiet: bool = False):
+        if rate_limit < 0 or max_retries < 0:
+            raise ValueError(f"rate_limit and max_retries must not be negative, got {rate_limit} and {max_retries}")
+        self.rate_limit = rate_limit
+        self.burst = max(1.0, rate_limit * BURST_FACTOR)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        # Keep retries and failures without printing them, for callers that report errors themselves
+        self.quiet = quiet
+        self.concurrency_limit = float(self.max_concurrency)
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "failed": 0}
+        self.events = deque(maxlen=MAX_EVENTS)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._slots = threading.Condition(self._lock)
+
+    def _wait_for_token(self):
+        if not self.rate_limit:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_limit)
+            self._updated = now
+            # Take the token now, even if it is only available later, so waiting callers keep their order
+            self._tokens -= 1
+            delay = -self._tokens / self.rate_limit if self._tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+    def _acquire(self):
+        with self._slots:
+            while self._active >= int(self.concurrency_limit):
+                self._slots.wait()
+            self._active += 1
+            self.stats["requests"] += 1
+
+    def _release(self, succeeded: bool = True, throttled: bool = False):
+        with self._slots:
+            self._active -= 1
+            if throttled:
+                self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+            elif succeeded:
+                self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+            self._slots.notify_all()
+
+    def _record(self, kind: str, message: str):
+        with self._lock:
+            self.stats[kind] += 1
+            self.events.append(message)
+            if not self.quiet:
+                print(message)
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with jitter: between half and all of ``BACKOFF_BASE * 2**attempt``."""
+        delay = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def call(self, func, *args):
+        """Run ``func(*args)``, retrying the errors marked ``retryable``.
+
+        Errors that are not retryable, and retryable ones still failing after
+        ``max_retries`` retries, are recorded and raised to the caller.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_token()
+            self._acquire()
+            try:
+                result = func(*args)
+            except Exception as e:
+                throttled = getattr(e, "throttled", False)
+                self._release(succeeded=False, throttled=throttled)
+                if not getattr(e, "retryable", False) or attempt == self.max_retries:
+                    self._record("failed", f"Gave up after {attempt + 1} attempt(s): {e}")
+                    raise
+                if throttled:
+                    with self._lock:
+                        self.stats["throttled"] += 1
+                delay = max(self.backoff(attempt), getattr(e, "retry_after", None) or 0)
+                self._record("retries", f"Retrying in {delay:.1f}s (attempt {attempt + 2}/{self.max_retries + 1}): {e}")
+                time.sleep(delay)
+            else:
+                self._release()
+                return result
+
+    def summary(self) -> str:
+        return (f"API requests: {self.stats['requests']} sent, {self.stats['retries']} retried "
+                f"({self.stats['throttled']} throttled), {self.stats['failed']} failed; "
+                f"concurrency limit {int(self.concurrency_limit)}/{self.max_concurrency}")
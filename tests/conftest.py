@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.fleet import make_fleet, write_fleet
+from benchmarks.stub_apiserver import StubApiServer
+
+@pytest.fixture(autouse=True)
+def no_proxy(monkeypatch):
+    """Proxy variables of the environment would send the API backend to kubectl."""
+    for name in ("HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY", "http_proxy", "https_proxy", "no_proxy"):
+        monkeypatch.delenv(name, raising=False)
+
+@pytest.fixture
+def stub(tmp_path):
+    """A stub API server for a fleet of a management and three workload clusters, with their Nodes."""
+    write_fleet(make_fleet(4, min_pools=1, max_pools=2, with_nodes=True), str(tmp_path))
+    server = StubApiServer(str(tmp_path)).start()
+    server.write_kubeconfig(str(tmp_path / "stub.conf"))
+    yield server
+    server.shutdown()
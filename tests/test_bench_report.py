@@ -0,0 +1,19 @@
+import json
+
+from benchmarks.bench_report import compare
+
+def test_compare_needs_a_relative_and_an_absolute_slowdown(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps([
+        {"clusters": 10, "stage": "collection", "wall": 0.010},
+        {"clusters": 5000, "stage": "collection", "wall": 2.0},
+        {"clusters": 5000, "stage": "end-to-end", "wall": 4.0},
+    ]))
+    results = [
+        # Three times slower, but only 20 ms: jitter
+        {"clusters": 10, "stage": "collection", "wall": 0.030},
+        {"clusters": 5000, "stage": "collection", "wall": 2.6},
+        {"clusters": 5000, "stage": "end-to-end", "wall": 4.5},
+    ]
+    assert compare(results, str(baseline), 0.25) == ["5000 clusters / collection: 2.000s -> 2.600s"]
+    assert len(compare(results, str(baseline), 0.25, min_delta=0)) == 2
@@ -0,0 +1,52 @@
+import gzip
+import json
+import os
+import subprocess
+import sys
+
+from conftest import REPO_DIR
+
+SELECTOR = "cluster.x-k8s.io/cluster-name in (workload-00001,workload-00003)"
+
+def report(stub, tmp_path, name, *options):
+    """Run nkp-as-built.py against the stub in a directory of its own and return the report."""
+    directory = tmp_path / name
+    directory.mkdir()
+    env = dict(os.environ, KUBECONFIG=os.path.join(stub.fleet_dir, "stub.conf"))
+    run = subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, "nkp-as-built.py"), "--backend", "api", "--no-cache", "--no-history",
+         *options],
+        cwd=directory, env=env, capture_output=True, text=True, timeout=60)
+    assert run.returncode == 0, run.stderr
+    return (directory / "cluster_details.html").read_text()
+
+def test_a_replayed_bundle_gives_the_same_report(stub, tmp_path):
+    bundle = str(tmp_path / "bundle")
+    live = report(stub, tmp_path, "live", "--capture", bundle)
+    assert "workload-00002" in live
+    # The bundle is read without any cluster access
+    stub.shutdown()
+    assert report(stub, tmp_path, "replay", "--from-bundle", bundle) == live
+
+def test_a_bundle_is_filtered_by_selector_when_replayed(stub, tmp_path):
+    bundle = str(tmp_path / "bundle")
+    report(stub, tmp_path, "capture", "--capture", bundle)
+    selected = report(stub, tmp_path, "selected", "--selector", SELECTOR)
+    assert "workload-00001" in selected and "workload-00002" not in selected
+    assert report(stub, tmp_path, "replay", "--from-bundle", bundle, "--selector", SELECTOR) == selected
+
+def test_no_secret_is_written_to_a_bundle(stub, tmp_path):
+    bundle = tmp_path / "bundle"
+    # --nodes reads every workload cluster's kubeconfig Secret
+    assert "Ready=True" in report(stub, tmp_path, "capture", "--nodes", "--capture", str(bundle))
+    assert any("/secrets/" in path for path in stub.requests)
+    secrets = {item["data"]["value"] for item in stub.items("secrets")}
+    names = os.listdir(bundle)
+    assert not [name for name in names if name.startswith("secrets")]
+    for name in names:
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(bundle / name, "rt") as file:
+            content = file.read()
+        assert '"kind":"Secret"' not in content.replace(" ", "")
+        assert not [secret for secret in secrets if secret in content]
+    assert json.loads((bundle / "manifest.json").read_text())["source"]
@@ -0,0 +1,49 @@
+import copy
+import os
+
+from nkp_inventory import cache
+from nkp_inventory.bundle import CapturingBackend
+from nkp_inventory.collect import CLUSTER_FIELDS
+from nkp_inventory.kube import get_backend, make_selectors
+
+def caching_backend(stub, tmp_path):
+    return cache.CachingBackend(get_backend("api", os.path.join(stub.fleet_dir, "stub.conf")), str(tmp_path / "cache"))
+
+def names(items):
+    return sorted(item["metadata"]["name"] for item in items)
+
+def test_only_changed_clusters_are_fetched(stub, tmp_path, monkeypatch):
+    # The stub fleet is so small that one change would otherwise be worth a full list
+    monkeypatch.setattr(cache, "FULL_LIST_RATIO", 0.5)
+    all_names = names(caching_backend(stub, tmp_path).iter_projected("clusters", CLUSTER_FIELDS))
+    changed, deleted = copy.deepcopy(stub.items("clusters")[1:3])
+    changed["spec"]["topology"]["version"] = "v1.31.1"
+    stub.emit("clusters", "MODIFIED", changed)
+    stub.emit("clusters", "DELETED", deleted)
+
+    backend = caching_backend(stub, tmp_path)
+    items = list(backend.iter_projected("clusters", CLUSTER_FIELDS))
+    assert names(items) == [name for name in all_names if name != "workload-00002"]
+    assert backend.stats == {"fetched": 1, "reused": 2}
+    assert next(item for item in items if item["metadata"]["name"] == "workload-00001")["spec"]["topology"][
+        "version"] == "v1.31.1"
+
+def test_capturing_a_cached_list_keeps_its_selectors(stub, tmp_path):
+    backend = CapturingBackend(caching_backend(stub, tmp_path), str(tmp_path / "bundle"))
+    selectors = make_selectors("cluster.x-k8s.io/cluster-name=workload-00003")
+    assert {item["metadata"]["labels"]["cluster.x-k8s.io/cluster-name"]
+            for item in backend.list("machines", selectors=selectors)["items"]} == {"workload-00003"}
+
+def test_concurrent_snapshot_writers_do_not_collide(stub, tmp_path):
+    first, second = caching_backend(stub, tmp_path), caching_backend(stub, tmp_path)
+    path = first._snapshot_path("clusters")
+    items = stub.items("clusters")
+    # Interleave two writers of the same snapshot, as two --targets workers would
+    writers = [first._save_snapshot(path, iter(items)), second._save_snapshot(path, iter(items[:2]))]
+    for _ in range(2):
+        for writer in writers:
+            next(writer)
+    assert list(writers[1]) == []
+    assert list(writers[0]) == items[2:]
+    assert names(first._load_snapshot(path).values()) == names(items)
+    assert os.listdir(first.cache_dir) == [os.path.basename(path)]
@@ -0,0 +1,32 @@
+import pytest
+
+from nkp_inventory.capacity import CapacityTable, parse_cpu, parse_gib
+
+@pytest.mark.parametrize("quantity, gib", [
+    ("32Gi", 32.0), ("4096Mi", 4.0), ("1Ti", 1024.0), ("1.5Gi", 1.5), (" 2Gi ", 2.0),
+    ("1073741824", 1.0), ("2G", 2 * 10**9 / 2**30), ("", 0.0), (None, 0.0), ("32GB", 0.0), ("-1Gi", 0.0),
+])
+def test_parse_gib(quantity, gib):
+    assert parse_gib(quantity) == pytest.approx(gib)
+
+@pytest.mark.parametrize("quantity, cores", [
+    ("4", 4.0), (4, 4.0), ("3800m", 3.8), ("0.5", 0.5), ("", 0.0), (None, 0.0), ("lots", 0.0), ("m", 0.0),
+])
+def test_parse_cpu(quantity, cores):
+    assert parse_cpu(quantity) == pytest.approx(cores)
+
+def test_rollup_totals_every_group_and_counts_each_subnet_of_a_pool():
+    capacity = CapacityTable()
+    capacity.add_row([3, 12, 48.0, 240.0, "pe-1", ["vlan-10"], "image-a", "v1.30.5"])
+    capacity.add_row([2, 16, 64.0, 160.0, "pe-1", ["vlan-10", "vlan-20"], "image-a", "v1.29.6"])
+    capacity.add_row([1, 4, 8.0, 80.0, "pe-2", [], None, "v1.30.5"])
+
+    fleet = capacity.fleet_total()
+    assert (fleet.pools, fleet.nodes, fleet.vcpus, fleet.memory_gib, fleet.disk_gib) == (3, 6, 32, 120.0, 480.0)
+    assert [(total.group, total.pools, total.nodes, total.vcpus) for total in capacity.rollup("prism_cluster")] == [
+        ("pe-1", 2, 5, 28), ("pe-2", 1, 1, 4)]
+    assert [(total.group, total.nodes) for total in capacity.rollup("image")] == [("image-a", 5), ("N/A", 1)]
+    # The pool on two subnets counts under both, so the subnets add up to more than the fleet
+    assert [(total.group, total.pools, total.nodes, total.vcpus) for total in capacity.rollup("subnet")] == [
+        ("vlan-10", 2, 5, 28), ("vlan-20", 1, 2, 16), ("N/A", 1, 1, 4)]
+    assert sum(total.nodes for total in capacity.rollup("kubernetes_version")) == fleet.nodes
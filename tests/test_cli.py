@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO_DIR
+
+CONFLICTS = [
+    ["--serve", ":0", "--from-bundle", "bundle"],
+    ["--serve", ":0", "--capture", "bundle"],
+    ["--serve", ":0", "--no-cache"],
+    ["--serve", ":0", "--profile"],
+    ["--targets", "a.conf", "b.conf", "--profile", "trace.json"],
+    ["--targets", "a.conf", "--split", "out"],
+]
+
+@pytest.mark.parametrize("options", CONFLICTS, ids=" ".join)
+def test_conflicting_options_are_rejected(tmp_path, options):
+    run = subprocess.run([sys.executable, os.path.join(REPO_DIR, "nkp-as-built.py"), *options],
+                         cwd=tmp_path, capture_output=True, text=True, timeout=30)
+    assert run.returncode == 2
+    assert "error:" in run.stderr and "Traceback" not in run.stderr
+    assert not os.listdir(tmp_path)
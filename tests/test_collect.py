@@ -0,0 +1,47 @@
+import os
+
+from benchmarks.fleet import make_cluster, make_machines, make_pool_controllers
+from nkp_inventory.collect import build_machine_index, build_pool_status, build_replica_index, get_machine_index
+from nkp_inventory.kube import get_backend
+from nkp_inventory.model import extract_cluster
+
+def test_clusters_with_the_same_name_in_two_namespaces_keep_their_own_pools():
+    clusters = [make_cluster("web", "team-a", pools=1), make_cluster("web", "team-b", pools=1)]
+    machines, controllers = [], []
+    for cluster, machines_per_pool in zip(clusters, (1, 2)):
+        machines += make_machines(cluster, machines_per_pool)
+        control_plane, deployments = make_pool_controllers(cluster, machines_per_pool)
+        controllers += [control_plane, *deployments]
+    machines[-1]["status"]["phase"] = "Provisioning"
+
+    unhealthy = {}
+    machine_index = build_machine_index(machines, unhealthy)
+    pool_status = build_pool_status(build_replica_index(controllers), unhealthy)
+    team_a, team_b = (extract_cluster(cluster, machine_index, pool_status=pool_status) for cluster in clusters)
+
+    assert [len(pool.nodes) for pool in team_a.worker_pools] == [1]
+    assert [len(pool.nodes) for pool in team_b.worker_pools] == [2]
+    assert [pool.status.desired for pool in team_a.worker_pools] == [1]
+    assert [pool.status.desired for pool in team_b.worker_pools] == [2]
+    assert team_a.worker_pools[0].status.unhealthy == []
+    assert team_b.worker_pools[0].status.unhealthy == [f"{machines[-1]['metadata']['name']} (Provisioning)"]
+
+def test_machines_are_listed_page_by_page(stub):
+    kubeconfig = os.path.join(stub.fleet_dir, "stub.conf")
+    machine_index = get_machine_index(get_backend("api", kubeconfig, chunk_size=0))
+    stub.requests.clear()
+    assert get_machine_index(get_backend("api", kubeconfig, chunk_size=3)) == machine_index
+    pages = [path for path in stub.requests if "/machines?" in path]
+    assert len(pages) == -(-len(stub.items("machines")) // 3)
+    assert all("limit=3" in path for path in pages)
+    assert all("continue=" in path for path in pages[1:])
+
+def test_an_expired_continue_token_keeps_the_first_pages(stub):
+    stub.expire_continue = True
+    warnings = []
+    machine_index = get_machine_index(get_backend("api", os.path.join(stub.fleet_dir, "stub.conf"), chunk_size=3),
+                                      warnings=warnings)
+    assert sum(len(nodes) for nodes in machine_index.values()) == 3
+    assert len(warnings) == 1
+    assert warnings[0].startswith("Listing machines stopped after 3 objects")
+    assert "410" in warnings[0]
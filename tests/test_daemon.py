@@ -0,0 +1,103 @@
+import copy
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from nkp_inventory import daemon
+from nkp_inventory.kube import get_backend
+
+class FlakyBackend:
+    """Delegates to ``backend``, except that watching clusters fails while ``broken`` is set."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.broken = threading.Event()
+
+    def list(self, *args, **kwargs):
+        return self.backend.list(*args, **kwargs)
+
+    def watch(self, resource, *args, **kwargs):
+        if resource == "clusters" and self.broken.is_set():
+            raise RuntimeError("watch exploded")
+        return self.backend.watch(resource, *args, **kwargs)
+
+@pytest.fixture
+def served(stub, monkeypatch):
+    monkeypatch.setattr(daemon, "RETRY_DELAY", 0.1)
+    backend = FlakyBackend(get_backend("api", os.path.join(stub.fleet_dir, "stub.conf")))
+    server = daemon.create_server(backend, "127.0.0.1:0")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, backend
+    server.shutdown()
+    server.server_close()
+
+def fetch(server, path):
+    host, port = server.server_address[:2]
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}{path}", timeout=10) as response:
+            return response.status, response.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode()
+
+def cluster_versions(server):
+    report = json.loads(fetch(server, "/report.json")[1])
+    return {cluster["name"]: cluster["kubernetes_version"] for cluster in report["clusters"]}
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the daemon"
+        time.sleep(0.05)
+
+def watch_requests(stub):
+    return sum(1 for path in stub.requests if "/clusters?" in path and "watch=1" in path)
+
+def test_watch_events_reach_the_report(stub, served):
+    server, _ = served
+    assert fetch(server, "/healthz") == (200, "ok")
+    assert sorted(cluster_versions(server)) == sorted(item["metadata"]["name"] for item in stub.items("clusters"))
+    wait_for(lambda: stub.watching("clusters"))
+
+    added, changed, deleted = copy.deepcopy(stub.items("clusters")[1:4])
+    added["metadata"].update(name="workload-added", uid="uid-added")
+    changed["spec"]["topology"]["version"] = "v1.31.1"
+    stub.emit("clusters", "ADDED", added)
+    stub.emit("clusters", "MODIFIED", changed)
+    stub.emit("clusters", "DELETED", deleted)
+    wait_for(lambda: deleted["metadata"]["name"] not in cluster_versions(server))
+    versions = cluster_versions(server)
+    assert "workload-added" in versions
+    assert versions[changed["metadata"]["name"]] == "v1.31.1"
+
+def test_a_dropped_watch_is_resumed(stub, served):
+    server, _ = served
+    wait_for(lambda: watch_requests(stub) == 1)
+    stub.drop_watches("clusters")
+    wait_for(lambda: watch_requests(stub) == 2 and stub.watching("clusters"))
+
+    changed = copy.deepcopy(stub.items("clusters")[1])
+    changed["spec"]["topology"]["version"] = "v1.31.1"
+    stub.emit("clusters", "MODIFIED", changed)
+    wait_for(lambda: cluster_versions(server)[changed["metadata"]["name"]] == "v1.31.1")
+    assert fetch(server, "/healthz") == (200, "ok")
+
+def test_a_failing_watcher_shows_in_healthz_and_recovers(stub, served):
+    server, backend = served
+    wait_for(lambda: stub.watching("clusters"))
+    backend.broken.set()
+    stub.drop_watches("clusters")
+    wait_for(lambda: fetch(server, "/healthz")[0] == 503)
+    assert fetch(server, "/healthz")[1] == "clusters: RuntimeError: watch exploded"
+
+    # Changes made while the watch is down are picked up by the relist
+    changed = copy.deepcopy(stub.items("clusters")[1])
+    changed["spec"]["topology"]["version"] = "v1.31.1"
+    stub.emit("clusters", "MODIFIED", changed)
+    backend.broken.clear()
+    wait_for(lambda: fetch(server, "/healthz") == (200, "ok"))
+    assert cluster_versions(server)[changed["metadata"]["name"]] == "v1.31.1"
@@ -0,0 +1,37 @@
+import os
+import socket
+
+from nkp_inventory.cli import build_parser
+from nkp_inventory.fanout import collect_targets, generate_combined_sections, parse_targets
+
+def test_a_failed_or_stalled_target_does_not_affect_the_others(stub, tmp_path):
+    # A management cluster that accepts connections and never answers
+    stalled = socket.socket()
+    stalled.bind(("127.0.0.1", 0))
+    stalled.listen()
+    stalled_conf = tmp_path / "stalled.conf"
+    stub.write_kubeconfig(str(stalled_conf))
+    host, port = stalled.getsockname()
+    stalled_conf.write_text(stalled_conf.read_text().replace(stub.url, f"http://{host}:{port}"))
+
+    targets = parse_targets([os.path.join(stub.fleet_dir, "stub.conf"), str(tmp_path / "missing.conf"),
+                             str(stalled_conf)])
+    args = build_parser("test").parse_args(["--backend", "api", "--no-cache", "--no-history"])
+    directory = tmp_path / "fragments"
+    directory.mkdir()
+    try:
+        good, missing, timed_out = collect_targets(targets, args, str(directory), timeout=5)
+    finally:
+        stalled.close()
+
+    assert good.summary["clusters"] == 4 and "error" not in good.summary
+    assert "missing.conf" in missing.summary["error"]
+    assert timed_out.summary == {"error": "Timed out after 5s"}
+    assert timed_out.elapsed >= 5
+
+    report = "".join(generate_combined_sections([good, missing, timed_out]))
+    with open(good.fragment) as file:
+        assert file.read() in report
+    assert "workload-00003" in report
+    assert "<p>Collection failed: Timed out after 5s</p>" in report
+    assert all(f"<h1 id='mc-{index}'>" in report for index in range(3))
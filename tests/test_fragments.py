@@ -0,0 +1,37 @@
+import copy
+import os
+
+from nkp_inventory import fragments
+from nkp_inventory.collect import collect_inventory
+from nkp_inventory.fragments import FragmentCache
+from nkp_inventory.kube import get_backend
+from nkp_inventory.report import generate_report_sections
+
+def render(inventory, cache=None):
+    return "".join(generate_report_sections(inventory, fragments=cache))
+
+def test_only_the_changed_cluster_is_rebuilt(stub, tmp_path):
+    backend = get_backend("api", os.path.join(stub.fleet_dir, "stub.conf"))
+    directory = str(tmp_path / "fragments")
+    first = FragmentCache(directory)
+    render(collect_inventory(backend), first)
+    assert first.stats == {"reused": 0, "rebuilt": 4}
+
+    changed = copy.deepcopy(stub.items("clusters")[2])
+    changed["spec"]["topology"]["version"] = "v1.31.1"
+    stub.emit("clusters", "MODIFIED", changed)
+    inventory = collect_inventory(backend)
+    second = FragmentCache(directory)
+    html = render(inventory, second)
+    assert second.stats == {"reused": 3, "rebuilt": 1}
+    assert "v1.31.1" in html
+    assert html == render(inventory)
+
+def test_fragments_of_another_code_version_are_not_reused(stub, tmp_path, monkeypatch):
+    inventory = collect_inventory(get_backend("api", os.path.join(stub.fleet_dir, "stub.conf")))
+    directory = str(tmp_path / "fragments")
+    render(inventory, FragmentCache(directory))
+    monkeypatch.setattr(fragments, "_code_version", lambda: "another version")
+    cache = FragmentCache(directory)
+    render(inventory, cache)
+    assert cache.stats == {"reused": 0, "rebuilt": 4}
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO_DIR
+from nkp_inventory.history import HistoryStore, Snapshot
+
+@pytest.fixture
+def history(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    store = HistoryStore(path)
+    for taken_at in ("2026-09-01T08:00:00Z", "2026-09-02T08:00:00Z", "2026-09-03T08:00:00Z"):
+        store.save(Snapshot(taken_at, "stub", "mgmt", "v2.12.0"))
+    yield store, path
+    store.close()
+
+def test_resolve_valid_refs(history):
+    store, _ = history
+    assert store.resolve("latest") == 3
+    assert store.resolve("latest~2") == 1
+    assert store.resolve("2") == 2
+    assert store.resolve("2026-09-02") == 2
+    assert store.resolve("2026-09-02T07:59:59Z") == 1
+    assert store.resolve("2026-09-02T10:00:00+02:00") == 2
+
+@pytest.mark.parametrize("ref", ["foo", "yesterday", "2026-13-99", "latest~x", "latest~-1", "latest~"])
+def test_resolve_invalid_refs(history, ref):
+    store, _ = history
+    with pytest.raises(LookupError, match="Invalid snapshot"):
+        store.resolve(ref)
+
+def test_resolve_before_first_snapshot(history):
+    store, _ = history
+    with pytest.raises(LookupError, match="No snapshot"):
+        store.resolve("2026-08-31")
+
+def test_diff_with_invalid_ref_exits_with_error(history):
+    _, path = history
+    run = subprocess.run([sys.executable, os.path.join(REPO_DIR, "nkp-history.py"), "--history", path,
+                          "diff", "latest~x", "latest"], capture_output=True, text=True)
+    assert run.returncode != 0
+    assert "Error: Invalid snapshot 'latest~x'" in run.stderr
+    assert "Traceback" not in run.stderr
@@ -0,0 +1,59 @@
+import pytest
+
+from nkp_inventory.kube import ApiBackend, KubectlBackend, KubeError, get_backend
+
+BAD_KUBECONFIGS = {
+    "invalid YAML": "current-context: [stub\n",
+    "not a mapping": "- stub\n",
+    "malformed contexts": "current-context: stub\ncontexts: [stub]\n",
+    "bad certificate data": (
+        "current-context: stub\n"
+        "contexts: [{name: stub, context: {cluster: stub, user: stub}}]\n"
+        "clusters: [{name: stub, cluster: {server: 'https://127.0.0.1:6443', certificate-authority-data: '%%%'}}]\n"
+        "users: [{name: stub, user: {token: stub}}]\n"
+    ),
+}
+
+def kubeconfig(cluster: str) -> str:
+    return (
+        "current-context: stub\n"
+        "contexts: [{name: stub, context: {cluster: stub, user: stub}}]\n"
+        f"clusters: [{{name: stub, cluster: {cluster}}}]\n"
+        "users: [{name: stub, user: {token: stub}}]\n"
+    )
+
+BAD_KUBECONFIGS.update({
+    "malformed port": kubeconfig("{server: 'https://127.0.0.1:64x3'}"),
+    "no scheme": kubeconfig("{server: '127.0.0.1:6443'}"),
+    "proxy-url": kubeconfig("{server: 'https://127.0.0.1:6443', proxy-url: 'http://proxy:3128'}"),
+    "tls-server-name": kubeconfig("{server: 'https://127.0.0.1:6443', tls-server-name: 'kubernetes'}"),
+})
+
+@pytest.mark.parametrize("content", BAD_KUBECONFIGS.values(), ids=BAD_KUBECONFIGS.keys())
+def test_auto_falls_back_to_kubectl_on_unusable_kubeconfig(tmp_path, content):
+    path = tmp_path / "kubeconfig"
+    path.write_text(content)
+    assert isinstance(get_backend("auto", str(path)), KubectlBackend)
+    with pytest.raises(KubeError):
+        get_backend("api", str(path))
+
+def test_cache_key_tells_contexts_and_users_apart(tmp_path):
+    path = tmp_path / "kubeconfig"
+    path.write_text(
+        "current-context: admin\n"
+        "contexts: [{name: admin, context: {cluster: stub, user: admin}},"
+        " {name: viewer, context: {cluster: stub, user: viewer}}]\n"
+        "clusters: [{name: stub, cluster: {server: 'http://127.0.0.1:6443'}}]\n"
+        "users: [{name: admin, user: {token: admin}}, {name: viewer, user: {token: viewer}}]\n"
+    )
+    admin = get_backend("api", str(path))
+    assert admin.cache_key == get_backend("api", str(path), "admin").cache_key
+    assert admin.cache_key != get_backend("api", str(path), "viewer").cache_key
+
+def test_auto_falls_back_to_kubectl_behind_a_proxy(tmp_path, monkeypatch):
+    path = tmp_path / "kubeconfig"
+    path.write_text(kubeconfig("{server: 'https://10.0.0.1:6443'}"))
+    monkeypatch.setenv("HTTPS_PROXY", "http://proxy:3128")
+    assert isinstance(get_backend("auto", str(path)), KubectlBackend)
+    monkeypatch.setenv("NO_PROXY", "10.0.0.1")
+    assert isinstance(get_backend("auto", str(path)), ApiBackend)
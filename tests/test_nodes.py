@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+import time
+
+from conftest import REPO_DIR
+
+def test_node_timeout_bounds_the_whole_run(stub, tmp_path):
+    stub.stalled.add("workload-00002")
+    env = dict(os.environ, KUBECONFIG=os.path.join(stub.fleet_dir, "stub.conf"))
+    start = time.monotonic()
+    run = subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, "nkp-as-built.py"), "--backend", "api", "--nodes",
+         "--node-timeout", "2", "--no-cache", "--no-history"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60)
+    elapsed = time.monotonic() - start
+
+    assert run.returncode == 0, run.stderr
+    # The process exits at the deadline, not after retries of the stalled cluster's requests
+    assert elapsed < 10
+    assert "Retrying" not in run.stdout and "Gave up" not in run.stdout
+    report = (tmp_path / "cluster_details.html").read_text()
+    assert "Unavailable: Timed out after 2s" in report
+    assert "workload-00001-cp-00000" in report
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from benchmarks import stub_apiserver
+from nkp_inventory.collect import CONTROL_PLANE_FIELDS, MACHINE_DEPLOYMENT_FIELDS, MACHINE_FIELDS
+from nkp_inventory.kube import TABLE_ACCEPT, get_backend, project
+
+PROJECTED = {
+    "machines": MACHINE_FIELDS,
+    "machinedeployments": MACHINE_DEPLOYMENT_FIELDS,
+    "kubeadmcontrolplanes": CONTROL_PLANE_FIELDS,
+}
+
+def recording_backend(stub):
+    """An API backend that keeps the Accept header of every request it sends."""
+    backend = get_backend("api", os.path.join(stub.fleet_dir, "stub.conf"), chunk_size=3)
+    backend.accepts = []
+    request = backend._request
+
+    def record(path, headers):
+        backend.accepts.append(headers["Accept"])
+        return request(path, headers)
+
+    backend._request = record
+    return backend
+
+@pytest.mark.parametrize("resource", PROJECTED)
+def test_tables_are_projected_like_full_objects(stub, resource):
+    backend = recording_backend(stub)
+    fields = PROJECTED[resource]
+    assert list(backend.iter_projected(resource, fields)) == [project(item, fields) for item in stub.items(resource)]
+    assert backend.accepts and set(backend.accepts) == {TABLE_ACCEPT}
+    assert TABLE_ACCEPT.startswith("application/json;as=Table;g=meta.k8s.io;v=v1")
+    assert all("includeObject=Metadata" in path for path in stub.requests if f"/{resource}?" in path)
+
+def test_a_server_without_tables_gets_objects_projected(stub):
+    stub.tables = False
+    backend = recording_backend(stub)
+    assert list(backend.iter_projected("machines", MACHINE_FIELDS)) == [
+        project(item, MACHINE_FIELDS) for item in stub.items("machines")]
+    assert set(backend.accepts) == {TABLE_ACCEPT}
+
+def test_a_table_without_the_columns_falls_back_to_full_objects(stub, monkeypatch):
+    # An older CRD that does not define the printer columns
+    monkeypatch.setitem(stub_apiserver.PRINTER_COLUMNS, "machinedeployments", [])
+    backend = recording_backend(stub)
+    assert list(backend.iter_projected("machinedeployments", MACHINE_DEPLOYMENT_FIELDS)) == [
+        project(item, MACHINE_DEPLOYMENT_FIELDS) for item in stub.items("machinedeployments")]
+    assert backend.accepts[0] == TABLE_ACCEPT
+    assert backend.accepts[1:] and set(backend.accepts[1:]) == {"application/json"}
@@ -0,0 +1,59 @@
+import os
+
+from benchmarks.fleet import PROVIDER_LABEL, make_cluster
+from nkp_inventory.collect import collect_inventory
+from nkp_inventory.kube import get_backend
+from nkp_inventory.model import extract_cluster
+from nkp_inventory.report import generate_html_report, generate_html_table, save_split_output
+
+def test_split_output_with_trailing_slash(stub, tmp_path):
+    inventory = collect_inventory(get_backend("api", os.path.join(stub.fleet_dir, "stub.conf")))
+    directory = tmp_path / "out"
+    for _ in range(2):
+        # The second run replaces the report of the first
+        save_split_output(inventory, f"{directory}{os.sep}")
+
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("out.")]
+    assert not [name for name in os.listdir(directory) if name.startswith(".")]
+    assert (directory / "index.html").exists()
+    assert len(os.listdir(directory / "clusters")) == 4
+
+def test_project_is_shown_for_the_control_plane_only():
+    cluster = extract_cluster(make_cluster("web", "team-a", pools=2), {})
+    assert "project" in dict(cluster.control_plane.machine.fields())
+    assert all("project" not in dict(pool.machine.fields(with_project=False)) for pool in cluster.worker_pools)
+    assert generate_html_table(cluster).count("<b>project</b>") == 1
+
+# Kubernetes names cannot hold "/", so the cluster name opens a script tag without closing it
+HOSTILE_NAME = "web<script>alert('x&y')"
+HOSTILE = "<script>alert('x&y')</script>"
+
+def hostile_inventory():
+    cluster = make_cluster(HOSTILE_NAME, "team-a", pools=1)
+    cluster["metadata"]["labels"][PROVIDER_LABEL] = HOSTILE
+    control_plane = cluster["spec"]["controlPlaneRef"]["name"]
+    return {
+        "version": "v2.12.0", "airgapped": False, "kommander_cluster_name": HOSTILE, "dkp_level": "Pro",
+        "clusters": [cluster],
+        "machine_index": {("team-a", HOSTILE_NAME, control_plane): [HOSTILE]},
+        "pool_status": {},
+        "warnings": [f"Retrying GET /clusters: {HOSTILE}"],
+    }
+
+def assert_escaped(html, scripts=0):
+    # Only the report's own filter script may open a script element
+    assert html.count("<script>") == scripts
+    assert "&lt;script&gt;alert(&#x27;x&amp;y&#x27;)&lt;/script&gt;" in html
+    assert "x&y" not in html
+
+def test_single_page_report_escapes_names_labels_and_warnings():
+    html = generate_html_report(hostile_inventory())
+    assert_escaped(html)
+    assert "web&lt;script&gt;alert(&#x27;x&amp;y&#x27;)" in html
+
+def test_split_report_escapes_names_labels_and_warnings(tmp_path):
+    directory = tmp_path / "out"
+    save_split_output(hostile_inventory(), str(directory))
+    assert_escaped((directory / "index.html").read_text(), scripts=1)
+    (page,) = os.listdir(directory / "clusters")
+    assert_escaped((directory / "clusters" / page).read_text())
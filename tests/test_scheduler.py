@@ -0,0 +1,34 @@
+import pytest
+
+from nkp_inventory.cli import build_parser
+from nkp_inventory.kube import ThrottledError, TransientError
+from nkp_inventory.scheduler import RequestScheduler
+
+def fail(error):
+    raise error
+
+def test_concurrency_limit_only_grows_back_on_success(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    scheduler = RequestScheduler(rate_limit=0, max_concurrency=8, max_retries=0, quiet=True)
+    with pytest.raises(TransientError):
+        scheduler.call(fail, ThrottledError("too many requests"))
+    assert scheduler.concurrency_limit == 4
+
+    for _ in range(5):
+        with pytest.raises(TransientError):
+            scheduler.call(fail, TransientError("timed out"))
+    assert scheduler.concurrency_limit == 4
+
+    scheduler.call(lambda: None)
+    assert scheduler.concurrency_limit == 4.25
+
+@pytest.mark.parametrize("option", ["--max-retries=-1", "--rate-limit=-0.5"])
+def test_negative_retries_and_rate_limit_are_rejected(option, capsys):
+    with pytest.raises(SystemExit):
+        build_parser("test").parse_args([option])
+    assert "must be 0 or more" in capsys.readouterr().err
+
+@pytest.mark.parametrize("settings", [{"max_retries": -1}, {"rate_limit": -0.5}])
+def test_scheduler_rejects_negative_settings(settings):
+    with pytest.raises(ValueError):
+        RequestScheduler(**settings)